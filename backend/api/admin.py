@@ -1,28 +1,109 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+
 from users.models import User, Subscription
-from recipes.models import Recipe, Ingredient, Favorite, ShoppingCart
+from recipes.models import (
+    Recipe, Ingredient, RecipeIngredient, Favorite, ShoppingCart
+)
+from recipes.signals import ingredients_changed
+
+from . import shopping_list
+from .deletion import disable_user, hide_recipes
+from .tasks import delete_recipe, delete_user
+
+# Ниже этого числа строк таблица считается точно
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
+
+# Пагинатор без COUNT(*) по большой таблице: для списка без фильтров
+# берётся оценка планировщика PostgreSQL из pg_class.reltuples
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class '
+                    'WHERE oid = %s::regclass',
+                    [connection.ops.quote_name(queryset.model._meta.db_table)]
+                )
+                row = cursor.fetchone()
+            if row and row[0] > ESTIMATED_COUNT_THRESHOLD:
+                return row[0]
+        return super().count
+
+
+class BaseAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Иначе при поиске и фильтрах админка считает ещё и всю таблицу
+    show_full_result_count = False
 
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
-    list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff')
+    list_display = (
+        'username', 'email', 'first_name', 'last_name', 'is_staff',
+        'subscribers_count',
+    )
     search_fields = ('username', 'email')
     list_filter = ('is_staff', 'is_superuser', 'is_active')
     ordering = ('username',)
     filter_horizontal = ('groups', 'user_permissions')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # Удаление из админки идёт через ту же фоновую задачу, что и в API
+    def delete_model(self, request, obj):
+        disable_user(obj)
+        delete_user.delay(user_id=obj.pk)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            self.delete_model(request, user)
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(BaseAdmin):
     list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
     search_fields = ('user__username', 'author__username')
+    autocomplete_fields = ('user', 'author')
+
+
+# Состав рецепта; ингредиент выбирается поиском, а не списком из тысяч строк
+class RecipeIngredientInline(admin.TabularInline):
+    model = RecipeIngredient
+    autocomplete_fields = ('ingredient',)
+    extra = 0
+    min_num = 1
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(BaseAdmin):
     list_display = ('name', 'display_author', 'favorites_count')
+    list_select_related = ('author',)
     search_fields = ('name', 'author__username')
+    autocomplete_fields = ('author',)
+    inlines = (RecipeIngredientInline,)
+
+    def get_queryset(self, request):
+        # Коррелированный подзапрос считается только для строк страницы,
+        # пока по нему не сортируют
+        favorites = Favorite.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            total=Count('pk')
+        ).values('total')
+        return super().get_queryset(request).annotate(
+            favorites_total=Coalesce(Subquery(favorites), 0)
+        )
 
     def display_author(self, obj):
         return (
@@ -32,24 +113,93 @@ class RecipeAdmin(admin.ModelAdmin):
     display_author.short_description = 'Автор'
 
     def favorites_count(self, obj):
-        return obj.favorited_by.count()
+        return obj.favorites_total
     favorites_count.short_description = 'В избранном'
+    favorites_count.admin_order_field = 'favorites_total'
+
+    # Популярный рецепт тянет за собой тысячи строк избранного и корзин,
+    # поэтому сразу только скрывается, а удаляется фоновой задачей порциями
+    def delete_model(self, request, obj):
+        self.delete_recipes([obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        self.delete_recipes(list(queryset.values_list('pk', flat=True)))
+
+    def delete_recipes(self, recipe_ids):
+        with transaction.atomic():
+            hide_recipes(recipe_ids)
+            for recipe_id in recipe_ids:
+                delete_recipe.delay(recipe_id=recipe_id)
+
+    def get_deleted_objects(self, objs, request):
+        # Страница подтверждения не обходит каскад: связанные строки
+        # удалит задача, перечислять их тысячами незачем
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        recipes = [str(obj) for obj in objs]
+        return (
+            recipes, {self.opts.verbose_name_plural: len(recipes)},
+            perms_needed, []
+        )
+
+    def save_related(self, request, form, formsets, change):
+        # Списки покупок и индексы обновляются так же, как при правке через API
+        recipe = form.instance
+        previous = {}
+        if change:
+            previous = dict(recipe.ingredient_amounts.values_list(
+                'ingredient_id', 'amount'
+            ))
+        super().save_related(request, form, formsets, change)
+        current = dict(recipe.ingredient_amounts.values_list(
+            'ingredient_id', 'amount'
+        ))
+        if current != previous:
+            ingredients_changed.send(
+                sender=Recipe, recipe=recipe, previous=previous
+            )
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(BaseAdmin):
     list_display = ('name', 'measurement_unit')
     search_fields = ('name',)
     list_filter = ('measurement_unit',)
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(BaseAdmin):
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(BaseAdmin):
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+
+    # Списки покупок пересчитываются так же, как при изменении корзины в API
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            if change:
+                previous = ShoppingCart.objects.select_related(
+                    'user', 'recipe'
+                ).get(pk=obj.pk)
+                shopping_list.remove_recipe(previous.user, previous.recipe)
+            super().save_model(request, obj, form, change)
+            shopping_list.add_recipe(obj.user, obj.recipe)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            deleted, _ = ShoppingCart.objects.filter(pk=obj.pk).delete()
+            if deleted:
+                shopping_list.remove_recipe(obj.user, obj.recipe)
+
+    def delete_queryset(self, request, queryset):
+        for cart in queryset.select_related('user', 'recipe'):
+            self.delete_model(request, cart)
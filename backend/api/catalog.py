@@ -0,0 +1,104 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from recipes.models import Ingredient
+
+from . import compression
+from .renderers import ORJSONRenderer
+
+VERSION_KEY = 'ingredient-catalog-version'
+SNAPSHOT_KEY = 'ingredient-catalog:{}'
+CATALOG_FIELDS = ('id', 'name', 'measurement_unit')
+
+# version — хэш содержимого, encoded — тело, заранее сжатое каждой кодировкой
+Snapshot = namedtuple('Snapshot', ['version', 'body', 'encoded'])
+
+
+def bump_version():
+    # Справочник изменился: следующий запрос соберёт новый снимок
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def build_snapshot():
+    # Тело совпадает с ответом /api/ingredients/ без фильтра. Читаем
+    # с основной БД: снимок с отстающей реплики закэшировался бы под новой
+    # версией
+    rows = list(
+        Ingredient.objects.using('default').values(*CATALOG_FIELDS)
+    )
+    body = ORJSONRenderer().render(rows)
+    return Snapshot(
+        version=hashlib.blake2b(body, digest_size=8).hexdigest(),
+        body=body,
+        encoded={
+            encoding: codec[0](body)
+            for encoding, codec in compression.CODECS.items()
+        },
+    )
+
+
+# Снимок справочника в памяти процесса; общий кэш хранит его между процессами
+class Catalog:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counter = None
+        self.snapshot = None
+        self.built_at = 0
+
+    def is_stale(self, counter):
+        # Срок жизни — страховка на случай, если сигнал об изменении
+        # до процесса не дошёл (кэш не общий, правка в обход ORM)
+        age = time.monotonic() - self.built_at
+        return counter != self.counter or age > settings.CATALOG_SNAPSHOT_TTL
+
+    def get(self):
+        counter = cache.get(VERSION_KEY, 0)
+        if self.is_stale(counter):
+            with self.lock:
+                if self.is_stale(counter):
+                    key = SNAPSHOT_KEY.format(counter)
+                    snapshot = cache.get(key)
+                    if snapshot is None or counter == self.counter:
+                        snapshot = build_snapshot()
+                        cache.set(key, snapshot, settings.CATALOG_SNAPSHOT_TTL)
+                    self.snapshot, self.counter = snapshot, counter
+                    self.built_at = time.monotonic()
+        return self.snapshot
+
+
+catalog = Catalog()
+
+
+def snapshot_response(request, snapshot, **cache_control):
+    # Готовое тело без рендеринга; сжатие выбирается по Accept-Encoding.
+    # ETag слабый: сжатые представления побайтно различаются
+    etag = f'W/"{snapshot.version}"'
+    if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+    else:
+        encoding = compression.negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if encoding is None:
+            response = HttpResponse(
+                snapshot.body, content_type='application/json'
+            )
+        else:
+            response = HttpResponse(
+                snapshot.encoded[encoding], content_type='application/json'
+            )
+            response.headers['Content-Encoding'] = encoding
+    response.headers['ETag'] = etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    patch_cache_control(response, **cache_control)
+    return response
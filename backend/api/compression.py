@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/msgpack', 'application/javascript',
+    'application/xml', 'text/',
+)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+
+# Потоковые компрессоры с общим интерфейсом compress()/finish()
+class GzipStream:
+    def __init__(self):
+        self.compressor = zlib.compressobj(
+            GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16
+        )
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliStream:
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class ZstdStream:
+    def __init__(self):
+        self.compressor = zstandard.ZstdCompressor(
+            level=ZSTD_LEVEL
+        ).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+def brotli_compress(data):
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+
+def zstd_compress(data):
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+
+def gzip_compress(data):
+    return gzip.compress(data, GZIP_LEVEL, mtime=0)
+
+
+# Кодировки в порядке предпочтения сервера; без библиотеки кодировка
+# не предлагается
+CODECS = {}
+if brotli is not None:
+    CODECS['br'] = (brotli_compress, BrotliStream)
+if zstandard is not None:
+    CODECS['zstd'] = (zstd_compress, ZstdStream)
+CODECS['gzip'] = (gzip_compress, GzipStream)
+
+
+def is_compressible(content_type):
+    return content_type.split(';')[0].strip().startswith(COMPRESSIBLE_TYPES)
+
+
+def negotiate(accept_encoding):
+    # Кодировка с наибольшим q; при равенстве — по порядку CODECS
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            weights[name] = quality
+    best, best_quality = None, 0.0
+    for name in CODECS:
+        quality = weights.get(name, weights.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def compress(encoding, data, shareable=False):
+    # Одинаковые для всех тела (популярные страницы для анонимов)
+    # сжимаются один раз
+    compressor = CODECS[encoding][0]
+    if not shareable or len(data) > settings.COMPRESSION_CACHE_MAX_SIZE:
+        return compressor(data)
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    key = f'compressed:{encoding}:{digest}'
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = compressor(data)
+        cache.set(key, compressed, settings.COMPRESSION_CACHE_TIMEOUT)
+    return compressed
+
+
+def compress_stream(encoding, chunks):
+    stream = CODECS[encoding][1]()
+    for chunk in chunks:
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.finish()
@@ -0,0 +1,45 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Реплика, выбранная для чтений текущего запроса; None — основная БД.
+# Одна реплика на запрос, чтобы все его чтения видели один снимок
+read_alias = ContextVar('read_alias', default=None)
+
+
+def pin_key(user_id):
+    return f'db-pin:{user_id}'
+
+
+def pin(user):
+    # После записи пользователь читает с основной БД, пока реплики догоняют
+    if user.is_authenticated and settings.DATABASE_REPLICAS:
+        cache.set(pin_key(user.pk), 1, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return user.is_authenticated and cache.get(pin_key(user.pk)) is not None
+
+
+def choose_replica(user):
+    if not settings.DATABASE_REPLICAS or is_pinned(user):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+# Чтения направляются на реплику только там, где представление её выбрало
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias.get() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной БД, связи между объектами допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,136 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (
+    Favorite, FeedEntry, Recipe, RecipeLSHBucket, ShoppingCart,
+    ShoppingListItem, ShoppingListPDF
+)
+from users.models import Subscription
+
+from . import feed, shopping_list, short_links
+
+User = get_user_model()
+
+# Удаление разбито на шаги: каждый шаг — одна короткая транзакция над
+# ограниченным числом строк, поэтому горячие таблицы не блокируются надолго.
+# Шаги идемпотентны: прерванное удаление можно продолжить с начала
+
+
+def delete_batches(queryset, batch_size):
+    model = queryset.model
+    while True:
+        pks = list(
+            queryset.order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return
+        model.objects.filter(pk__in=pks).delete()
+        yield
+
+
+def cart_batches(recipe, batch_size):
+    # Рецепт убирается из чужих корзин вместе с его ингредиентами в списках
+    # покупок
+    composition = shopping_list.get_composition(recipe)
+    delta = {
+        ingredient_id: -amount
+        for ingredient_id, amount in composition.items()
+    }
+    while True:
+        with transaction.atomic():
+            carts = list(
+                ShoppingCart.objects.select_for_update().filter(recipe=recipe)
+                .order_by('pk').values_list('pk', 'user_id')[:batch_size]
+            )
+            if not carts:
+                return
+            ShoppingCart.objects.filter(
+                pk__in=[pk for pk, _ in carts]
+            ).delete()
+            shopping_list.apply_delta(
+                [user_id for _, user_id in carts], delta
+            )
+        yield
+
+
+def recipe_steps(recipe, batch_size):
+    yield from cart_batches(recipe, batch_size)
+    for model in (Favorite, FeedEntry, RecipeLSHBucket):
+        yield from delete_batches(
+            model.objects.filter(recipe=recipe), batch_size
+        )
+    # Осталось несколько строк состава; сигналы рецепта удалят картинку
+    recipe.delete()
+    yield
+
+
+def subscription_batches(user, batch_size):
+    # Подписки пользователя: у авторов пересчитываются счётчики подписчиков
+    while True:
+        rows = list(
+            Subscription.objects.filter(user=user).order_by('pk')
+            .values_list('pk', 'author_id')[:batch_size]
+        )
+        if not rows:
+            return
+        Subscription.objects.filter(pk__in=[pk for pk, _ in rows]).delete()
+        feed.reconcile_subscriber_counts(
+            [author_id for _, author_id in rows]
+        )
+        yield
+
+
+def pdf_batches(user, batch_size):
+    while True:
+        jobs = ShoppingListPDF.objects.filter(user=user).order_by('pk')
+        jobs = list(jobs[:batch_size])
+        if not jobs:
+            return
+        for job in jobs:
+            job.file.delete(save=False)
+        ShoppingListPDF.objects.filter(
+            pk__in=[job.pk for job in jobs]
+        ).delete()
+        yield
+
+
+def user_steps(user, batch_size):
+    while True:
+        recipe = Recipe.all_objects.filter(author=user).order_by(
+            'pk'
+        ).first()
+        if recipe is None:
+            break
+        yield from recipe_steps(recipe, batch_size)
+    for model in (ShoppingCart, ShoppingListItem, Favorite, FeedEntry):
+        yield from delete_batches(model.objects.filter(user=user), batch_size)
+    yield from subscription_batches(user, batch_size)
+    yield from delete_batches(
+        Subscription.objects.filter(author=user), batch_size
+    )
+    yield from pdf_batches(user, batch_size)
+    # Сигналы пользователя удалят аватар
+    user.delete()
+    yield
+
+
+def disable_user(user):
+    # Аккаунт отключается сразу: вход и токены перестают работать,
+    # а данные удаляет фоновая задача
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        Token.objects.filter(user=user).delete()
+
+
+def hide_recipes(recipe_ids):
+    # Рецепты пропадают из выдачи и коротких ссылок сразу, а строки
+    # удаляет фоновая задача
+    with transaction.atomic():
+        Recipe.objects.filter(pk__in=recipe_ids).update(is_deleted=True)
+        for recipe_id in recipe_ids:
+            transaction.on_commit(
+                partial(short_links.record_change, recipe_id, False)
+            )
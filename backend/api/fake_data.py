@@ -0,0 +1,258 @@
+import csv
+import io
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from foodgram.storage import image_storage
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart
+)
+from users.models import Subscription
+
+from . import catalog
+from .utils import PLACEHOLDER_PNG, batched
+
+User = get_user_model()
+
+PLACEHOLDER_IMAGE = 'recipes/images/placeholder.png'
+FAKE_PASSWORD = 'benchmark-password'
+
+
+def get_placeholder_image():
+    # Одна картинка на все сгенерированные рецепты; хранилище картинок
+    # называет файл по содержимому, поэтому повторный вызов его не копирует
+    return image_storage().save(
+        PLACEHOLDER_IMAGE, ContentFile(PLACEHOLDER_PNG)
+    )
+
+
+def power_law_weights(count, alpha, rng):
+    # Накопленные веса Ципфа для случайной перестановки рангов
+    ranks = list(range(1, count + 1))
+    rng.shuffle(ranks)
+    total = 0.0
+    cumulative = []
+    for rank in ranks:
+        total += rank ** -alpha
+        cumulative.append(total)
+    return cumulative
+
+
+# Генератор синтетических данных со степенным распределением активности
+class FakeDataGenerator:
+    def __init__(self, alpha=1.1, batch_size=50_000, seed=42, log=print):
+        self.alpha = alpha
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.log = log
+        self.use_copy = connection.vendor == 'postgresql'
+
+    def run(self, users, recipes, ingredients_per_recipe, favorites_per_user,
+            carts_per_user, subscriptions_per_user):
+        ingredient_ids = self.get_ingredient_ids()
+        user_ids = self.create_users(users)
+        recipe_ids = self.create_recipes(recipes, user_ids)
+        self.create_recipe_ingredients(
+            recipe_ids, ingredient_ids, ingredients_per_recipe
+        )
+        self.create_links(
+            Favorite, 'recipe_id', user_ids, recipe_ids, favorites_per_user,
+            timestamps=True
+        )
+        self.create_links(
+            ShoppingCart, 'recipe_id', user_ids, recipe_ids, carts_per_user,
+            timestamps=True
+        )
+        self.create_links(
+            Subscription, 'author_id', user_ids, user_ids,
+            subscriptions_per_user
+        )
+        self.reset_sequences()
+        call_command('rebuild_feeds')
+        call_command('rebuild_shopping_lists')
+        call_command('build_pantry_index')
+        if self.use_copy:
+            # COPY не вызывает Recipe.save(), поисковые векторы
+            # считаем отдельно
+            call_command('backfill_search_vectors')
+
+    def get_ingredient_ids(self, count=2000):
+        ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not ids:
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f'Ингредиент {i}', measurement_unit='г')
+                for i in range(count)
+            )
+            # bulk_create не посылает post_save
+            catalog.bump_version()
+            ids = list(Ingredient.objects.values_list('id', flat=True))
+        return ids
+
+    def next_id(self, model):
+        return (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+
+    def create_users(self, count):
+        password = make_password(FAKE_PASSWORD)
+        now = timezone.now()
+        start = self.next_id(User)
+        self.write(User, (
+            'id', 'username', 'email', 'first_name', 'last_name', 'password',
+            'is_superuser', 'is_staff', 'is_active', 'is_subscribed',
+            'date_joined',
+            'subscribers_count', 'updated_at',
+        ), (
+            (i, f'user{i}', f'user{i}@example.com', 'Имя', 'Фамилия', password,
+             False, False, True, False, now, 0, now)
+            for i in range(start, start + count)
+        ))
+        return list(range(start, start + count))
+
+    def create_recipes(self, count, user_ids):
+        image = get_placeholder_image()
+        now = timezone.now()
+        authors = power_law_weights(len(user_ids), self.alpha, self.rng)
+        start = self.next_id(Recipe)
+        rng = self.rng
+
+        def rows():
+            for i in range(start, start + count, self.batch_size):
+                size = min(self.batch_size, start + count - i)
+                chosen = rng.choices(user_ids, cum_weights=authors, k=size)
+                for offset, author_id in enumerate(chosen):
+                    # Порядок вызовов rng прежний: данные для того же seed
+                    # не меняются
+                    cooking_time = rng.randint(1, 180)
+                    age = rng.randint(0, 365 * 86400)
+                    pub_date = now - timedelta(seconds=age)
+                    yield (
+                        i + offset, author_id, f'Рецепт {i + offset}', image,
+                        'Описание рецепта. ' * 20, cooking_time, pub_date,
+                        pub_date,
+                    )
+
+        self.write(Recipe, (
+            'id', 'author_id', 'name', 'image', 'text', 'cooking_time',
+            'pub_date', 'updated_at',
+        ), rows())
+        return list(range(start, start + count))
+
+    def create_recipe_ingredients(self, recipe_ids, ingredient_ids,
+                                  per_recipe):
+        popularity = power_law_weights(
+            len(ingredient_ids), self.alpha, self.rng
+        )
+        rng = self.rng
+        start = self.next_id(RecipeIngredient)
+
+        def rows():
+            row_id = start
+            for recipe_id in recipe_ids:
+                size = max(1, round(rng.gauss(per_recipe, per_recipe / 3)))
+                chosen = self.sample_distinct(ingredient_ids, popularity, size)
+                for ingredient_id in chosen:
+                    yield row_id, recipe_id, ingredient_id, rng.randint(1, 500)
+                    row_id += 1
+
+        self.write(RecipeIngredient, (
+            'id', 'recipe_id', 'ingredient_id', 'amount',
+        ), rows())
+
+    def create_links(self, model, target_field, user_ids, target_ids, per_user,
+                     timestamps=False):
+        # Активность пользователей и популярность целей распределены по Ципфу
+        now = timezone.now()
+        rng = self.rng
+        activity = power_law_weights(len(user_ids), self.alpha, self.rng)
+        popularity = power_law_weights(len(target_ids), self.alpha, self.rng)
+        total = per_user * len(user_ids)
+        limit = max(1, min(len(target_ids) // 2, per_user * 100))
+        start = self.next_id(model)
+
+        def rows():
+            row_id = start
+            previous = 0.0
+            for user_id, weight in zip(user_ids, activity):
+                share = (weight - previous) / activity[-1]
+                previous = weight
+                size = min(limit, round(total * share))
+                if not size:
+                    continue
+                chosen = self.sample_distinct(target_ids, popularity, size)
+                if target_field == 'author_id':
+                    chosen.discard(user_id)
+                for target_id in chosen:
+                    if timestamps:
+                        age = rng.randint(0, 30 * 86400)
+                        created_at = now - timedelta(seconds=age)
+                        yield row_id, user_id, target_id, created_at
+                    else:
+                        yield row_id, user_id, target_id
+                    row_id += 1
+
+        fields = ('id', 'user_id', target_field)
+        if timestamps:
+            fields += ('created_at',)
+        self.write(model, fields, rows())
+
+    def sample_distinct(self, population, cum_weights, size):
+        size = min(size, len(population))
+        chosen = set()
+        for _ in range(10):
+            chosen.update(self.rng.choices(
+                population, cum_weights=cum_weights, k=size - len(chosen)
+            ))
+            if len(chosen) >= size:
+                break
+        return chosen
+
+    def write(self, model, fields, rows):
+        written = 0
+        for batch in batched(rows, self.batch_size):
+            if self.use_copy:
+                self.copy(model, fields, batch)
+            else:
+                model.objects.bulk_create(
+                    model(**dict(zip(fields, row))) for row in batch
+                )
+            written += len(batch)
+        self.log(f'{model._meta.verbose_name_plural}: +{written}')
+
+    def copy(self, model, fields, rows):
+        # COPY ... FROM STDIN из CSV-буфера в памяти
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        columns = ', '.join(
+            connection.ops.quote_name(model._meta.get_field(name).column)
+            for name in fields
+        )
+        sql = (
+            f'COPY {connection.ops.quote_name(model._meta.db_table)} '
+            f'({columns}) FROM STDIN WITH (FORMAT csv)'
+        )
+        with connection.cursor() as cursor:
+            raw_cursor = cursor.cursor
+            if hasattr(raw_cursor, 'copy_expert'):
+                raw_cursor.copy_expert(sql, buffer)
+            else:
+                with raw_cursor.copy(sql) as copy:
+                    copy.write(buffer.read())
+
+    def reset_sequences(self):
+        # После вставки с явными id сдвигаем последовательности
+        models = [
+            User, Recipe, RecipeIngredient, Favorite, ShoppingCart,
+            Subscription,
+        ]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
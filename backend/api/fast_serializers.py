@@ -0,0 +1,224 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Exists, F, OuterRef, Value, Window
+from django.db.models.functions import RowNumber
+from rest_framework import serializers
+
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from users.models import Subscription
+
+User = get_user_model()
+
+# Порядок ключей совпадает с полями соответствующих ModelSerializer,
+# поэтому JSON получается побайтно таким же
+RECIPE_FIELDS = (
+    'id', 'author', 'name', 'image', 'text', 'cooking_time', 'ingredients',
+    'pub_date', 'is_favorited', 'is_in_shopping_cart',
+)
+RECIPE_VALUES = (
+    'id', 'author_id', 'name', 'image', 'text', 'cooking_time', 'pub_date',
+)
+SHORT_RECIPE_VALUES = ('id', 'name', 'image', 'cooking_time')
+USER_VALUES = ('id', 'email', 'username', 'first_name', 'last_name', 'avatar')
+SUBSCRIPTION_VALUES = {
+    'email': F('author__email'),
+    'username': F('author__username'),
+    'first_name': F('author__first_name'),
+    'last_name': F('author__last_name'),
+    'avatar': F('author__avatar'),
+}
+
+datetime_field = serializers.DateTimeField()
+
+
+class MediaUrls:
+    # Абсолютные адреса файлов; одна картинка часто встречается много раз
+    def __init__(self, request, storage):
+        self.request = request
+        self.storage = storage
+        self.cache = {}
+
+    def __call__(self, name):
+        if not name:
+            return None
+        url = self.cache.get(name)
+        if url is None:
+            url = self.storage.url(name)
+            if self.request is not None:
+                url = self.request.build_absolute_uri(url)
+            self.cache[name] = url
+        return url
+
+
+def current_user(request):
+    user = getattr(request, 'user', None)
+    if user is None or user.is_anonymous:
+        return None
+    return user
+
+
+def subscribed_expression(request):
+    # Подписан ли текущий пользователь — подзапрос в том же SELECT
+    user = current_user(request)
+    if user is None:
+        return Value(False)
+    return Exists(
+        Subscription.objects.filter(user=user, author=OuterRef('pk'))
+    )
+
+
+def user_values(queryset, request):
+    # Имя is_subscribed занято полем модели, поэтому аннотация — subscribed
+    return queryset.annotate(subscribed=subscribed_expression(request)).values(
+        *USER_VALUES, 'subscribed'
+    )
+
+
+def user_row(user, subscribed=False):
+    # Строка для serialize_users из уже загруженного объекта, без запросов
+    row = {name: getattr(user, name) for name in USER_VALUES}
+    row['avatar'] = user.avatar.name
+    row['subscribed'] = subscribed
+    return row
+
+
+def serialize_users(rows, request):
+    # rows — словари из user_values() или user_row()
+    avatar_url = MediaUrls(request, User._meta.get_field('avatar').storage)
+    return [
+        {
+            'id': row['id'],
+            'email': row['email'],
+            'username': row['username'],
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+            'is_subscribed': row['subscribed'],
+            'avatar': avatar_url(row['avatar']),
+        }
+        for row in rows
+    ]
+
+
+def recipe_ids_of(model, request, recipe_ids):
+    user = current_user(request)
+    if user is None or not recipe_ids:
+        return set()
+    return set(model.objects.filter(
+        user=user, recipe_id__in=recipe_ids
+    ).values_list('recipe_id', flat=True))
+
+
+def ingredients_by_recipe(recipe_ids):
+    grouped = {recipe_id: [] for recipe_id in recipe_ids}
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('pk').values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount'
+    )
+    for recipe_id, ingredient_id, name, unit, amount in rows:
+        grouped[recipe_id].append({
+            'id': ingredient_id,
+            'name': name,
+            'measurement_unit': unit,
+            'amount': amount,
+        })
+    return grouped
+
+
+def serialize_recipes(rows, request, fields=None):
+    # rows — словари из Recipe.objects.values(*RECIPE_VALUES);
+    # связанные данные загружаются одним запросом на страницу
+    if fields is None:
+        fields = RECIPE_FIELDS
+    else:
+        fields = [name for name in RECIPE_FIELDS if name in fields]
+    recipe_ids = [row['id'] for row in rows]
+    authors = ingredients = {}
+    if 'author' in fields:
+        author_ids = {row['author_id'] for row in rows}
+        author_rows = user_values(
+            User.objects.filter(pk__in=author_ids), request
+        )
+        authors = {
+            author['id']: author
+            for author in serialize_users(list(author_rows), request)
+        }
+    if 'ingredients' in fields:
+        ingredients = ingredients_by_recipe(recipe_ids)
+    favorited = in_cart = ()
+    if 'is_favorited' in fields:
+        favorited = recipe_ids_of(Favorite, request, recipe_ids)
+    if 'is_in_shopping_cart' in fields:
+        in_cart = recipe_ids_of(ShoppingCart, request, recipe_ids)
+    image_url = MediaUrls(request, Recipe._meta.get_field('image').storage)
+
+    accessors = {
+        'id': lambda row: row['id'],
+        'author': lambda row: authors[row['author_id']],
+        'name': lambda row: row['name'],
+        'image': lambda row: image_url(row['image']),
+        'text': lambda row: row['text'],
+        'cooking_time': lambda row: row['cooking_time'],
+        'ingredients': lambda row: ingredients[row['id']],
+        'pub_date': lambda row: datetime_field.to_representation(
+            row['pub_date']
+        ),
+        'is_favorited': lambda row: row['id'] in favorited,
+        'is_in_shopping_cart': lambda row: row['id'] in in_cart,
+    }
+    compiled = [(name, accessors[name]) for name in fields]
+    return [
+        {name: accessor(row) for name, accessor in compiled} for row in rows
+    ]
+
+
+def recipe_values_fields(fields):
+    # Столбцы, которые нужно выбрать для запрошенных полей
+    if fields is None:
+        return RECIPE_VALUES
+    return tuple(
+        name for name in RECIPE_VALUES
+        if name in fields or name in ('id', 'author_id')
+    )
+
+
+def serialize_subscriptions(rows, request, recipes_limit=None):
+    # rows — словари из
+    # Subscription.objects.values('author_id', **SUBSCRIPTION_VALUES)
+    author_ids = [row['author_id'] for row in rows]
+    recipes = Recipe.objects.filter(author_id__in=author_ids)
+    counts = dict(
+        recipes.order_by().values('author_id').annotate(
+            total=Count('id')
+        ).values_list('author_id', 'total')
+    )
+    if recipes_limit is not None:
+        # Первые N рецептов каждого автора в порядке Recipe.Meta.ordering
+        recipes = recipes.annotate(row_number=Window(
+            RowNumber(), partition_by='author_id',
+            order_by=Recipe._meta.ordering
+        )).filter(row_number__lte=recipes_limit)
+    avatar_url = MediaUrls(request, User._meta.get_field('avatar').storage)
+    image_url = MediaUrls(request, Recipe._meta.get_field('image').storage)
+    recipes_by_author = {author_id: [] for author_id in author_ids}
+    for recipe in recipes.values('author_id', *SHORT_RECIPE_VALUES):
+        recipes_by_author[recipe['author_id']].append({
+            'id': recipe['id'],
+            'name': recipe['name'],
+            'image': image_url(recipe['image']),
+            'cooking_time': recipe['cooking_time'],
+        })
+    return [
+        {
+            'id': row['author_id'],
+            'email': row['email'],
+            'username': row['username'],
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+            'is_subscribed': True,
+            'avatar': avatar_url(row['avatar']),
+            'recipes': recipes_by_author[row['author_id']],
+            'recipes_count': counts.get(row['author_id'], 0),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,200 @@
+import base64
+import heapq
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Q, Subquery, Window
+from django.db.models.functions import Coalesce, RowNumber
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def is_heavy(author):
+    # Рецепты популярных авторов не рассылаются, а подмешиваются при чтении
+    return author.subscribers_count > settings.FEED_FANOUT_LIMIT
+
+
+def trim_timelines(user_ids):
+    # Оставляет в каждой ленте не больше FEED_TIMELINE_SIZE записей
+    overflow = list(
+        FeedEntry.objects.filter(user_id__in=user_ids)
+        .annotate(position=Window(
+            RowNumber(),
+            partition_by=[F('user_id')],
+            order_by=[F('pub_date').desc(), F('recipe_id').desc()],
+        ))
+        .filter(position__gt=settings.FEED_TIMELINE_SIZE)
+        .values_list('pk', flat=True)
+    )
+    if overflow:
+        FeedEntry.objects.filter(pk__in=overflow).delete()
+
+
+def fan_out(recipe):
+    # Кладёт новый рецепт в ленты подписчиков обычного автора
+    if is_heavy(recipe.author):
+        return
+    follower_ids = list(
+        Subscription.objects.filter(author_id=recipe.author_id)
+        .values_list('user_id', flat=True)
+    )
+    for start in range(0, len(follower_ids), BATCH_SIZE):
+        batch = follower_ids[start:start + BATCH_SIZE]
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(
+                    user_id=user_id, recipe_id=recipe.pk,
+                    author_id=recipe.author_id, pub_date=recipe.pub_date
+                )
+                for user_id in batch
+            ],
+            ignore_conflicts=True,
+        )
+        trim_timelines(batch)
+
+
+def latest_recipes(author):
+    return list(Recipe.objects.filter(author=author).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'pub_date')[:settings.FEED_TIMELINE_SIZE])
+
+
+def copy_recipes(user_ids, author, recipes):
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id, recipe_id=recipe_id,
+                author=author, pub_date=pub_date
+            )
+            for user_id in user_ids
+            for recipe_id, pub_date in recipes
+        ],
+        ignore_conflicts=True,
+    )
+    trim_timelines(user_ids)
+
+
+def add_author(user, author):
+    # Новая подписка: переносим в ленту последние рецепты автора
+    if is_heavy(author):
+        return
+    copy_recipes([user.pk], author, latest_recipes(author))
+
+
+def backfill_followers(author):
+    # Автор перестал быть «тяжёлым»: его рецепты больше не подмешиваются
+    # при чтении, поэтому раскладываются по лентам подписчиков
+    recipes = latest_recipes(author)
+    if not recipes:
+        return
+    follower_ids = list(
+        Subscription.objects.filter(author=author)
+        .values_list('user_id', flat=True)
+    )
+    # Порция ограничена числом строк, а не подписчиков
+    step = max(BATCH_SIZE // len(recipes), 1)
+    for start in range(0, len(follower_ids), step):
+        copy_recipes(follower_ids[start:start + step], author, recipes)
+
+
+def remove_author(user_id, author):
+    FeedEntry.objects.filter(user_id=user_id, author=author).delete()
+
+
+def rebuild_timeline(user):
+    FeedEntry.objects.filter(user=user).delete()
+    authors = User.objects.filter(
+        subscribers__user=user,
+        subscribers_count__lte=settings.FEED_FANOUT_LIMIT,
+    )
+    recipes = Recipe.objects.filter(author__in=authors).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'author_id', 'pub_date')[:settings.FEED_TIMELINE_SIZE]
+    FeedEntry.objects.bulk_create(
+        FeedEntry(
+            user=user, recipe_id=recipe_id,
+            author_id=author_id, pub_date=pub_date
+        )
+        for recipe_id, author_id, pub_date in recipes
+    )
+
+
+def reconcile_subscriber_counts(author_ids=None):
+    counts = Subscription.objects.filter(author=OuterRef('pk')).values(
+        'author'
+    ).annotate(total=Count('id')).values('total')
+    users = User.objects.all()
+    if author_ids is not None:
+        users = users.filter(pk__in=author_ids)
+    heavy_ids = list(users.filter(
+        subscribers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).values_list('pk', flat=True))
+    updated = users.update(subscribers_count=Coalesce(Subquery(counts), 0))
+    # Переход из «тяжёлых» в обычные: без переноса рецепты автора пропали
+    # бы из лент подписчиков до rebuild_feeds
+    for author in User.objects.filter(
+        pk__in=heavy_ids, subscribers_count__lte=settings.FEED_FANOUT_LIMIT
+    ):
+        backfill_followers(author)
+    return updated
+
+
+def encode_cursor(pub_date, recipe_id):
+    raw = json.dumps([pub_date.isoformat(), recipe_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    # Любой неверный курсор — ValueError, view отвечает 400
+    try:
+        pub_date, recipe_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode())
+        )
+        return datetime.fromisoformat(pub_date), int(recipe_id)
+    except (TypeError, ValueError):
+        raise ValueError('invalid feed cursor')
+
+
+def get_feed(user, cursor, limit):
+    # Слияние материализованной ленты и рецептов популярных авторов
+    entries = FeedEntry.objects.filter(user=user)
+    heavy = Recipe.objects.filter(author__in=User.objects.filter(
+        subscribers__user=user,
+        subscribers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ))
+    if cursor:
+        pub_date, recipe_id = cursor
+        entries = entries.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, recipe_id__lt=recipe_id)
+        )
+        heavy = heavy.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=recipe_id)
+        )
+    entries = entries.order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id'
+    )[:limit + 1]
+    heavy = heavy.order_by('-pub_date', '-pk').values_list(
+        'pub_date', 'pk'
+    )[:limit + 1]
+
+    page, seen = [], set()
+    for pub_date, recipe_id in heapq.merge(entries, heavy, reverse=True):
+        if recipe_id in seen:
+            continue
+        seen.add(recipe_id)
+        page.append((pub_date, recipe_id))
+        if len(page) > limit:
+            break
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(*page[-1])
+    return [recipe_id for _, recipe_id in page], next_cursor
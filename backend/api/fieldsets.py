@@ -0,0 +1,28 @@
+from rest_framework.exceptions import ValidationError
+
+
+def split_param(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+def requested_fields(request, compact_fields, allowed_fields):
+    # Набор полей из ?fields= и ?expand=; None — полное представление.
+    # expand без fields добавляет вложенные объекты к короткому представлению
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None
+    fields = split_param(request, 'fields')
+    expand = split_param(request, 'expand')
+    if fields is None and expand is None:
+        return None
+    if fields is None:
+        fields = set(compact_fields)
+    fields |= expand or set()
+    unknown = fields - set(allowed_fields)
+    if unknown:
+        raise ValidationError(
+            {'fields': [f'Неизвестные поля: {", ".join(sorted(unknown))}']}
+        )
+    return fields
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+
+from recipes.models import RECIPE_SEARCH_VECTOR, Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт поисковых векторов рецептов пачками по диапазонам id'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать все рецепты, а не только без вектора'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError(
+                'Полнотекстовый поиск доступен только на PostgreSQL'
+            )
+
+        bounds = Recipe.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            self.stdout.write('Рецептов нет.')
+            return
+
+        batch_size = options['batch_size']
+        updated = 0
+        for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+            # Короткие UPDATE по диапазону первичного ключа не держат
+            # блокировки долго
+            recipes = Recipe.objects.filter(
+                id__gte=start, id__lt=start + batch_size
+            )
+            if not options['all']:
+                recipes = recipes.filter(search_vector__isnull=True)
+            updated += recipes.update(search_vector=RECIPE_SEARCH_VECTOR)
+        self.stdout.write(self.style.SUCCESS(f'Обновлено рецептов: {updated}'))
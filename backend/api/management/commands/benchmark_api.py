@@ -0,0 +1,238 @@
+import json
+import subprocess
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.fake_data import FakeDataGenerator
+from api.utils import percentile
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
+from users.models import Subscription
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Замер задержек и числа SQL-запросов для маршрутов API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', action='store_true',
+            help='Сначала наполнить базу данными'
+        )
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--recipes', type=int, default=1_000_000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=10)
+        parser.add_argument('--favorites-per-user', type=int, default=50)
+        parser.add_argument('--carts-per-user', type=int, default=10)
+        parser.add_argument('--subscriptions-per-user', type=int, default=20)
+        parser.add_argument('--alpha', type=float, default=1.1)
+        parser.add_argument(
+            '--iterations', type=int, default=20, help='Повторов на маршрут'
+        )
+        parser.add_argument(
+            '--user-id', type=int, help='От чьего имени выполнять запросы'
+        )
+        parser.add_argument(
+            '--output', help='Файл для JSON-результатов (по умолчанию stdout)'
+        )
+        parser.add_argument(
+            '--compare', help='JSON предыдущего прогона для сравнения'
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            FakeDataGenerator(
+                alpha=options['alpha'], log=self.stdout.write
+            ).run(
+                users=options['users'],
+                recipes=options['recipes'],
+                ingredients_per_recipe=options['ingredients_per_recipe'],
+                favorites_per_user=options['favorites_per_user'],
+                carts_per_user=options['carts_per_user'],
+                subscriptions_per_user=options['subscriptions_per_user'],
+            )
+
+        user = self.get_user(options['user_id'])
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+
+        routes, toggles = self.get_routes(user)
+        results = {}
+        for route in routes:
+            results.update(
+                self.measure(client, [route], options['iterations'])
+            )
+        for pair in toggles:
+            results.update(self.measure(client, pair, options['iterations']))
+
+        report = {
+            'commit': self.get_commit(),
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'dataset': {
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'favorites': Favorite.objects.count(),
+                'shopping_carts': ShoppingCart.objects.count(),
+                'subscriptions': Subscription.objects.count(),
+            },
+            'iterations': options['iterations'],
+            'routes': results,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def get_user(self, user_id):
+        if user_id:
+            return User.objects.get(pk=user_id)
+        # Берём пользователя, у которого есть и избранное, и подписки
+        favorite = Favorite.objects.filter(
+            user__subscriptions__isnull=False
+        ).select_related('user').first()
+        if favorite:
+            return favorite.user
+        return User.objects.order_by('pk').first()
+
+    def get_routes(self, user):
+        recipe = Recipe.objects.order_by('-pk').first()
+        author = Subscription.objects.filter(user=user).values_list(
+            'author_id', flat=True
+        ).first() or user.id
+        target = User.objects.exclude(pk=user.pk).exclude(
+            subscribers__user=user
+        ).values_list('pk', flat=True).first()
+        ingredient = Ingredient.objects.values_list('pk', flat=True).first()
+
+        routes = [
+            ('ingredients_list', 'get', '/api/ingredients/'),
+            ('ingredients_search', 'get', '/api/ingredients/?name=сол'),
+            ('ingredients_detail', 'get', f'/api/ingredients/{ingredient}/'),
+            ('users_list', 'get', '/api/users/'),
+            ('users_detail', 'get', f'/api/users/{author}/'),
+            ('users_me', 'get', '/api/users/me/'),
+            (
+                'users_subscriptions', 'get',
+                '/api/users/subscriptions/?recipes_limit=3'
+            ),
+            ('recipes_list', 'get', '/api/recipes/'),
+            ('recipes_list_limit_100', 'get', '/api/recipes/?limit=100'),
+            ('recipes_list_page_100', 'get', '/api/recipes/?page=100'),
+            (
+                'recipes_list_author', 'get',
+                f'/api/recipes/?author={author}'
+            ),
+            (
+                'recipes_list_is_favorited', 'get',
+                '/api/recipes/?is_favorited=1'
+            ),
+            (
+                'recipes_list_is_in_shopping_cart', 'get',
+                '/api/recipes/?is_in_shopping_cart=1'
+            ),
+            (
+                'download_shopping_cart', 'get',
+                '/api/recipes/download_shopping_cart/'
+            ),
+        ]
+        # Переключатели: пара запросов добавить/удалить, данные не меняются
+        toggles = []
+        if recipe:
+            url = f'/api/recipes/{recipe.pk}/'
+            routes += [
+                ('recipes_detail', 'get', url),
+                ('recipes_get_link', 'get', f'{url}get-link/'),
+            ]
+            in_favorites = Favorite.objects.filter(user=user, recipe=recipe)
+            if not in_favorites.exists():
+                toggles.append((
+                    ('favorite_add', 'post', f'{url}favorite/'),
+                    ('favorite_remove', 'delete', f'{url}favorite/'),
+                ))
+            in_cart = ShoppingCart.objects.filter(user=user, recipe=recipe)
+            if not in_cart.exists():
+                toggles.append((
+                    ('shopping_cart_add', 'post', f'{url}shopping_cart/'),
+                    ('shopping_cart_remove', 'delete', f'{url}shopping_cart/'),
+                ))
+        if target:
+            toggles.append((
+                ('subscribe', 'post', f'/api/users/{target}/subscribe/'),
+                ('unsubscribe', 'delete', f'/api/users/{target}/subscribe/'),
+            ))
+        return routes, toggles
+
+    def measure(self, client, routes, iterations):
+        # Маршруты внутри группы выполняются по очереди на каждом повторе
+        samples = {name: ([], [], []) for name, _, _ in routes}
+        for _ in range(iterations):
+            for name, method, path in routes:
+                timings, queries, statuses = samples[name]
+                elapsed, count, status = self.request(client, method, path)
+                timings.append(elapsed)
+                queries.append(count)
+                statuses.append(status)
+        return {
+            name: self.summarize(method, path, *samples[name])
+            for name, method, path in routes
+        }
+
+    def request(self, client, method, path):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = getattr(client, method)(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - start) * 1000
+        return elapsed, len(context.captured_queries), response.status_code
+
+    def summarize(self, method, path, timings, queries, statuses):
+        timings = sorted(timings)
+        return {
+            'method': method.upper(),
+            'path': path,
+            'status': statuses[-1],
+            'errors': sum(status >= 400 for status in statuses),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'max_ms': round(timings[-1], 3),
+            'queries': max(queries),
+        }
+
+    def get_commit(self):
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                stderr=subprocess.DEVNULL, text=True
+            ).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def compare(self, path, results):
+        with open(path, encoding='utf-8') as f:
+            baseline = json.load(f)['routes']
+        for name, current in results.items():
+            previous = baseline.get(name)
+            if not previous:
+                continue
+            delta = current['p95_ms'] - previous['p95_ms']
+            style = self.style.ERROR if delta > 0 else self.style.SUCCESS
+            self.stderr.write(style(
+                f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} мс, "
+                f"запросов {previous['queries']} -> {current['queries']}"
+            ))
@@ -0,0 +1,178 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.fast_serializers import (
+    RECIPE_VALUES,
+    SUBSCRIPTION_VALUES,
+    serialize_recipes,
+    serialize_subscriptions,
+    serialize_users,
+    user_values,
+)
+from api.serializers import (
+    IngredientSerializer,
+    RecipeSerializer,
+    SubscriptionSerializer,
+    UserSerializer,
+)
+from api.utils import percentile
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from users.models import Subscription
+
+User = get_user_model()
+
+RECIPES_LIMIT = 3
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение процессорного времени DRF-сериализаторов '
+        'и быстрого пути чтения'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-sizes', default='6,50,200',
+            help='Размеры страниц через запятую'
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=20, help='Повторов на замер'
+        )
+        parser.add_argument(
+            '--user-id', type=int, help='От чьего имени сериализовать'
+        )
+        parser.add_argument('--output', help='Файл для JSON-результатов')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user_id'])
+        page_sizes = [
+            int(size) for size in options['page_sizes'].split(',')
+        ]
+        iterations = options['iterations']
+        renderer = JSONRenderer()
+        results = {}
+        for name, path, drf, fast in self.get_cases(user):
+            request = Request(
+                APIRequestFactory().get(path, SERVER_NAME='localhost')
+            )
+            request.user = user
+            for size in page_sizes:
+                # Ответы обоих путей должны совпадать побайтно
+                expected = renderer.render(drf(request, size))
+                if expected != renderer.render(fast(request, size)):
+                    raise CommandError(
+                        f'{name}, страница {size}: ответы различаются'
+                    )
+                key = f'{name}_{size}'
+                results[key] = {
+                    'drf': self.measure(drf, request, size, iterations),
+                    'fast': self.measure(fast, request, size, iterations),
+                }
+                drf_cpu = results[key]['drf']['cpu_p50_ms']
+                fast_cpu = results[key]['fast']['cpu_p50_ms']
+                results[key]['speedup'] = (
+                    round(drf_cpu / fast_cpu, 2) if fast_cpu else None
+                )
+                self.stdout.write(
+                    f'{key}: DRF {drf_cpu} мс CPU, '
+                    f'быстрый путь {fast_cpu} мс CPU, '
+                    f"x{results[key]['speedup']}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS('Ответы совпадают побайтно'))
+
+    def get_user(self, user_id):
+        if user_id:
+            return User.objects.get(pk=user_id)
+        subscription = Subscription.objects.order_by('pk').first()
+        if subscription is None:
+            raise CommandError(
+                'Нет подписок: сначала выполните generate_fake_data'
+            )
+        return subscription.user
+
+    def get_cases(self, user):
+        recipes = Recipe.objects.all()
+        # Полное представление: автор и состав догружаются заранее
+        full_recipes = recipes.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(Prefetch(
+            'ingredient_amounts',
+            queryset=RecipeIngredient.objects.select_related(
+                'ingredient'
+            ).order_by('pk')
+        ))
+        users = User.objects.order_by('pk')
+        subscriptions = Subscription.objects.filter(user=user).order_by('pk')
+        ingredients = Ingredient.objects.order_by('pk')
+
+        def drf(serializer_class, queryset):
+            def run(request, size):
+                return serializer_class(
+                    queryset[:size], many=True, context={'request': request}
+                ).data
+            return run
+
+        return [
+            (
+                'recipes', '/api/recipes/',
+                drf(RecipeSerializer, full_recipes),
+                lambda request, size: serialize_recipes(
+                    list(recipes.values(*RECIPE_VALUES)[:size]), request
+                ),
+            ),
+            (
+                'users', '/api/users/',
+                drf(UserSerializer, users),
+                lambda request, size: serialize_users(
+                    list(user_values(users, request)[:size]), request
+                ),
+            ),
+            (
+                'subscriptions',
+                f'/api/users/subscriptions/?recipes_limit={RECIPES_LIMIT}',
+                drf(
+                    SubscriptionSerializer,
+                    subscriptions.select_related('author')
+                ),
+                lambda request, size: serialize_subscriptions(
+                    list(subscriptions.values(
+                        'author_id', **SUBSCRIPTION_VALUES
+                    )[:size]),
+                    request, RECIPES_LIMIT
+                ),
+            ),
+            (
+                'ingredients', '/api/ingredients/',
+                drf(IngredientSerializer, ingredients),
+                lambda request, size: list(
+                    ingredients.values('id', 'name', 'measurement_unit')[:size]
+                ),
+            ),
+        ]
+
+    def measure(self, serialize, request, size, iterations):
+        # Процессорное время процесса; время работы сервера БД сюда не входит
+        cpu, wall = [], []
+        for _ in range(iterations):
+            cpu_start, wall_start = time.process_time(), time.perf_counter()
+            JSONRenderer().render(serialize(request, size))
+            cpu.append((time.process_time() - cpu_start) * 1000)
+            wall.append((time.perf_counter() - wall_start) * 1000)
+        cpu.sort()
+        wall.sort()
+        return {
+            'cpu_p50_ms': round(percentile(cpu, 50), 3),
+            'cpu_p95_ms': round(percentile(cpu, 95), 3),
+            'wall_p50_ms': round(percentile(wall, 50), 3),
+        }
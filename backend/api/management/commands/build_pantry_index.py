@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.pantry import write_index
+
+
+class Command(BaseCommand):
+    help = 'Построение файла индекса составов для подбора по продуктам'
+
+    def handle(self, *args, **options):
+        data = write_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано рецептов: {len(data.recipe_ids)}'
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from api.similarity import index_recipes
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Построение индекса MinHash/LSH для поиска похожих рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        indexed = 0
+        while True:
+            recipe_ids = list(
+                Recipe.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not recipe_ids:
+                break
+            index_recipes(recipe_ids)
+            indexed += len(recipe_ids)
+            last_id = recipe_ids[-1]
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано рецептов: {indexed}')
+        )
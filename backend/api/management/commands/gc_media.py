@@ -0,0 +1,90 @@
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.utils import batched
+from foodgram.storage import image_storage, modified_before
+from recipes.models import Recipe
+
+User = get_user_model()
+
+# Каталоги картинок и поля моделей, которые на них ссылаются
+MEDIA_DIRECTORIES = ('recipes/images', 'avatars')
+
+
+def walk(storage, directory):
+    # Листинг читается потоком: в памяти не бывает больше одной порции имён
+    root = storage.path(directory)
+    if not os.path.isdir(root):
+        return
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    name = os.path.relpath(entry.path, storage.location)
+                    name = name.replace(os.sep, '/')
+                    yield name, entry.stat()
+
+
+def referenced(names):
+    names = list(names)
+    return set(
+        Recipe.all_objects.filter(image__in=names).values_list(
+            'image', flat=True
+        )
+    ) | set(
+        User.objects.filter(avatar__in=names).values_list('avatar', flat=True)
+    )
+
+
+class Command(BaseCommand):
+    help = 'Удаление файлов картинок, на которые не ссылается ни одна запись'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--min-age', type=int, default=settings.MEDIA_DELETE_MIN_AGE,
+            help='Не трогать файлы моложе стольких секунд: запись '
+                 'о загрузке может быть ещё не закоммичена'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено'
+        )
+
+    def handle(self, *args, **options):
+        storage = image_storage()
+        cutoff = time.time() - options['min_age']
+        checked = deleted = freed = 0
+        for directory in MEDIA_DIRECTORIES:
+            files = (
+                (name, stat) for name, stat in walk(storage, directory)
+                if stat.st_mtime < cutoff
+            )
+            for batch in batched(files, options['batch_size']):
+                checked += len(batch)
+                used = referenced(name for name, _ in batch)
+                for name, stat in batch:
+                    # Повторная проверка перед удалением: файл могли
+                    # загрузить заново или уже удалить фоновой задачей
+                    if name in used:
+                        continue
+                    if not modified_before(storage, name, cutoff):
+                        continue
+                    if options['dry_run']:
+                        self.stdout.write(name)
+                    else:
+                        storage.delete(name)
+                    deleted += 1
+                    freed += stat.st_size
+        action = 'К удалению' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено файлов: {checked}\n'
+            f'{action}: {deleted} ({freed / 1024 / 1024:.1f} МБ)'
+        ))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.fake_data import FakeDataGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерация синтетических пользователей, рецептов, избранного, '
+        'корзин и подписок (COPY на PostgreSQL, bulk_create на остальных БД)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--recipes', type=int, default=1_000_000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=10)
+        parser.add_argument('--favorites-per-user', type=int, default=50)
+        parser.add_argument('--carts-per-user', type=int, default=10)
+        parser.add_argument('--subscriptions-per-user', type=int, default=20)
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help=(
+                'Показатель степенного распределения '
+                '(больше — сильнее перекос)'
+            )
+        )
+        parser.add_argument('--batch-size', type=int, default=50_000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        generator = FakeDataGenerator(
+            alpha=options['alpha'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        generator.run(
+            users=options['users'],
+            recipes=options['recipes'],
+            ingredients_per_recipe=options['ingredients_per_recipe'],
+            favorites_per_user=options['favorites_per_user'],
+            carts_per_user=options['carts_per_user'],
+            subscriptions_per_user=options['subscriptions_per_user'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - start:.1f} с'
+        ))
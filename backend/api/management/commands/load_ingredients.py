@@ -3,6 +3,8 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 from recipes.models import Ingredient
 
+from api import catalog
+
 
 class Command(BaseCommand):
     help = 'Загрузка ингредиентов из JSON файла'
@@ -31,6 +33,10 @@ class Command(BaseCommand):
                         else:
                             existing_count += 1
 
+                    # Снимок справочника для клиентов пересобирается
+                    # после коммита
+                    transaction.on_commit(catalog.bump_version)
+
                     self.stdout.write(
                         self.style.SUCCESS(
                             f'Успешно загружено:\n'
@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.deletion import delete_batches
+from recipes.models import Change
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаление записей журнала изменений старше срока хранения '
+        'токенов синхронизации'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.DELETION_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        # Токены старше срока хранения получают 410 (sync.check_retained),
+        # поэтому записи до этого срока никому не нужны
+        retention = timedelta(days=settings.SYNC_RETENTION_DAYS)
+        expired = Change.objects.filter(
+            created_at__lt=timezone.now() - retention
+        )
+        batches = sum(
+            1 for _ in delete_batches(expired, options['batch_size'])
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено порций записей журнала: {batches}'
+        ))
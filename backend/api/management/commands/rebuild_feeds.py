@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.feed import rebuild_timeline, reconcile_subscriber_counts
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков подписчиков и материализованных лент подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, help='Пересобрать ленту одного пользователя'
+        )
+
+    def handle(self, *args, **options):
+        reconcile_subscriber_counts()
+        users = User.objects.filter(subscriptions__isnull=False).distinct()
+        if options['user']:
+            users = users.filter(pk=options['user'])
+        rebuilt = 0
+        for user in users.only('pk').iterator():
+            rebuild_timeline(user)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'Пересобрано лент: {rebuilt}'))
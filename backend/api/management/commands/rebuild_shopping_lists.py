@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.shopping_list import rebuild
+from recipes.models import ShoppingListItem
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт агрегированных списков покупок по содержимому корзин'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, help='Пересчитать список одного пользователя'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(pk=options['user'])
+        else:
+            # Списки пользователей с пустой корзиной просто очищаются
+            ShoppingListItem.objects.exclude(
+                user__in=User.objects.filter(shoppingcart__isnull=False)
+            ).delete()
+            users = users.filter(shoppingcart__isnull=False).distinct()
+        rebuilt = 0
+        for user in users.only('pk').iterator():
+            rebuild(user)
+            rebuilt += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано списков: {rebuilt}')
+        )
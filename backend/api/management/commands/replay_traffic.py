@@ -0,0 +1,197 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.urls import Resolver404, resolve
+from rest_framework.authtoken.models import Token
+
+from api.traffic import identity_alias
+from api.utils import percentile
+
+User = get_user_model()
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class Command(BaseCommand):
+    help = 'Воспроизведение записанного трафика API и отчёт по маршрутам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', default=settings.TRAFFIC_CAPTURE_FILE,
+            help='JSONL с записанными запросами'
+        )
+        parser.add_argument(
+            '--target', default='http://localhost:8000',
+            help='Адрес сервера, на который подаётся нагрузка'
+        )
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--rate', type=float, default=0,
+            help='Запросов в секунду (0 — без ограничения)'
+        )
+        parser.add_argument(
+            '--tokens',
+            help='JSON-файл {псевдоним: токен} для авторизованных запросов'
+        )
+        parser.add_argument(
+            '--issue-tokens', action='store_true',
+            help=(
+                'Сопоставить псевдонимы пользователям локальной БД '
+                'и выдать им токены'
+            )
+        )
+        parser.add_argument(
+            '--limit', type=int, help='Сколько запросов воспроизвести'
+        )
+        parser.add_argument(
+            '--read-only', action='store_true',
+            help='Воспроизводить только GET/HEAD/OPTIONS'
+        )
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--output', help='Файл для JSON-отчёта')
+
+    def handle(self, *args, **options):
+        tokens = {}
+        if options['tokens']:
+            with open(options['tokens'], encoding='utf-8') as f:
+                tokens = json.load(f)
+        entries = self.load_entries(options)
+        if options['issue_tokens']:
+            tokens.update(self.issue_tokens(entries))
+        self.target = options['target'].rstrip('/')
+        self.timeout = options['timeout']
+        self.tokens = tokens
+        self.lock = threading.Lock()
+        self.samples = {}
+
+        interval = 1 / options['rate'] if options['rate'] else 0
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for index, entry in enumerate(entries):
+                pool.submit(self.replay, entry, start + index * interval)
+        elapsed = time.monotonic() - start
+
+        report = self.build_report(elapsed)
+        for route, stats in sorted(report['routes'].items()):
+            self.stdout.write(
+                f"{route}: {stats['count']} запр., {stats['rps']} rps, "
+                f"p50 {stats['p50_ms']} / p95 {stats['p95_ms']} / "
+                f"p99 {stats['p99_ms']} мс, ошибок {stats['error_rate']:.1%}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Всего {report['count']} запросов за {report['elapsed_s']} с, "
+            f"{report['rps']} rps, ошибок {report['error_rate']:.1%}"
+        ))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+    def load_entries(self, options):
+        entries = []
+        with open(options['file'], encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                method = entry['method']
+                if options['read_only'] and method not in SAFE_METHODS:
+                    continue
+                entries.append(entry)
+                if options['limit'] and len(entries) >= options['limit']:
+                    break
+        return entries
+
+    def issue_tokens(self, entries):
+        # Псевдоним необратим, поэтому перебираем пользователей и сравниваем
+        aliases = {
+            entry['identity'] for entry in entries if entry.get('identity')
+        }
+        tokens = {}
+        for user in User.objects.only('pk').iterator():
+            alias = identity_alias(user)
+            if alias in aliases:
+                tokens[alias] = Token.objects.get_or_create(user=user)[0].key
+        return tokens
+
+    def route_name(self, entry):
+        try:
+            match = resolve(entry['path'])
+        except Resolver404:
+            return f"{entry['method']} {entry['path']}"
+        return f"{entry['method']} {match.view_name or match._func_path}"
+
+    def replay(self, entry, scheduled):
+        delay = scheduled - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        url = self.target + entry['path']
+        if entry.get('query'):
+            url += '?' + entry['query']
+        headers = {'Accept': 'application/json'}
+        data = None
+        if isinstance(entry.get('body'), (dict, list)):
+            data = json.dumps(entry['body']).encode()
+            headers['Content-Type'] = 'application/json'
+        token = self.tokens.get(entry.get('identity'))
+        if token:
+            headers['Authorization'] = f'Token {token}'
+
+        request = Request(
+            url, data=data, headers=headers, method=entry['method']
+        )
+        started = time.perf_counter()
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                status = response.status
+        except HTTPError as error:
+            status = error.code
+        except (URLError, OSError):
+            status = None
+        elapsed = (time.perf_counter() - started) * 1000
+
+        with self.lock:
+            timings, statuses = self.samples.setdefault(
+                self.route_name(entry), ([], [])
+            )
+            timings.append(elapsed)
+            statuses.append(status)
+
+    def build_report(self, elapsed):
+        routes = {}
+        total = errors = 0
+        for route, (timings, statuses) in self.samples.items():
+            timings = sorted(timings)
+            failed = sum(
+                status is None or status >= 500 for status in statuses
+            )
+            routes[route] = {
+                'count': len(timings),
+                'rps': round(len(timings) / elapsed, 2),
+                'p50_ms': round(percentile(timings, 50), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'p99_ms': round(percentile(timings, 99), 3),
+                'client_errors': sum(
+                    status is not None and 400 <= status < 500
+                    for status in statuses
+                ),
+                'error_rate': failed / len(timings),
+            }
+            total += len(timings)
+            errors += failed
+        return {
+            'count': total,
+            'elapsed_s': round(elapsed, 3),
+            'rps': round(total / elapsed, 2) if elapsed else 0,
+            'error_rate': errors / total if total else 0,
+            'routes': routes,
+        }
@@ -0,0 +1,87 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.utils import percentile
+
+
+class Command(BaseCommand):
+    help = 'Сводка по самым медленным шаблонам SQL-запросов из журнала'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', default=settings.SLOW_QUERY_LOG_FILE,
+            help='Путь к журналу медленных запросов'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=10,
+            help='Сколько шаблонов вывести'
+        )
+        parser.add_argument(
+            '--sort', choices=['total', 'max', 'p95', 'count'],
+            default='total', help='Поле сортировки'
+        )
+
+    def handle(self, *args, **options):
+        stats = {}
+        for entry in self.read_entries(options['file']):
+            item = stats.setdefault(entry['fingerprint'], {
+                'fingerprint': entry['fingerprint'],
+                'sql': entry['sql'],
+                'durations': [],
+                'views': set(),
+                'plan': None,
+            })
+            item['durations'].append(entry['duration_ms'])
+            if entry.get('view'):
+                item['views'].add(entry['view'])
+            if entry.get('plan'):
+                item['plan'] = entry['plan']
+
+        if not stats:
+            self.stdout.write('Медленных запросов не найдено.')
+            return
+
+        for item in stats.values():
+            durations = sorted(item['durations'])
+            item['count'] = len(durations)
+            item['total'] = sum(durations)
+            item['max'] = durations[-1]
+            item['p95'] = percentile(durations, 95)
+
+        ranked = sorted(
+            stats.values(), key=lambda x: x[options['sort']], reverse=True
+        )
+        for item in ranked[:options['limit']]:
+            self.stdout.write(self.style.WARNING(
+                f"{item['fingerprint']}: {item['count']} раз, "
+                f"всего {item['total']:.1f} мс, p95 {item['p95']:.1f} мс, "
+                f"макс. {item['max']:.1f} мс"
+            ))
+            views = ', '.join(sorted(item['views'])) or '-'
+            self.stdout.write(f"  Представления: {views}")
+            self.stdout.write(f"  SQL: {item['sql']}")
+            if item['plan'] and 'error' not in item['plan']:
+                plan = item['plan'][0]
+                self.stdout.write(
+                    f"  План: {plan['Plan']['Node Type']}, "
+                    f"выполнение {plan.get('Execution Time', 0):.1f} мс"
+                )
+
+    def read_entries(self, path):
+        # Читает основной файл журнала и его ротированные копии
+        paths = [path]
+        index = 1
+        while os.path.exists(f'{path}.{index}'):
+            paths.append(f'{path}.{index}')
+            index += 1
+        for file_path in paths:
+            if not os.path.exists(file_path):
+                continue
+            with open(file_path, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from api.rankings import update_rankings
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчёт рейтингов popular/trending по новым событиям '
+        'избранного и корзины'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать всё с нуля (учитывает и удалённые события)'
+        )
+
+    def handle(self, *args, **options):
+        updated = update_rankings(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f'Обновлено рецептов: {updated}'))
@@ -0,0 +1,138 @@
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from . import compression, db_router, traffic
+from .slow_queries import SlowQueryLogger
+
+
+# Подключает журнал медленных запросов ко всем соединениям с БД
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SLOW_QUERY_LOG_ENABLED:
+            return self.get_response(request)
+        wrapper = SlowQueryLogger(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            return self.get_response(request)
+
+
+# Выборочно записывает запросы к API для последующего воспроизведения
+class TrafficCaptureMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.should_capture(request):
+            return self.get_response(request)
+        # Тело читаем до представления: DRF потом разберёт его из кэша
+        raw_body = request.body
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = (time.perf_counter() - start) * 1000
+        traffic.record(request, response, raw_body, duration)
+        return response
+
+    def should_capture(self, request):
+        if not settings.TRAFFIC_CAPTURE_ENABLED:
+            return False
+        if not request.path.startswith('/api/'):
+            return False
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        if length > settings.TRAFFIC_CAPTURE_MAX_BODY:
+            return False
+        return random.random() < settings.TRAFFIC_CAPTURE_SAMPLE_RATE
+
+
+# Сжимает ответы gzip/br/zstd по заголовку Accept-Encoding
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.should_compress(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compression.compress_stream(
+                encoding, response.streaming_content
+            )
+            del response.headers['Content-Length']
+        else:
+            content = compression.compress(
+                encoding, response.content,
+                self.is_shareable(request, response)
+            )
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+
+        # Сжатое тело уже не совпадает побайтно с исходным
+        etag = response.get('ETag')
+        if etag and not etag.startswith('W/'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def is_shareable(self, request, response):
+        # Общий кэш сжатых тел — только для ответов, одинаковых для всех:
+        # анонимных или явно публичных. Ответ пользователю сжимается на
+        # месте и в кэш не попадает
+        if request.method != 'GET':
+            return False
+        cache_control = response.get('Cache-Control', '')
+        if 'no-store' in cache_control or 'private' in cache_control:
+            return False
+        if 'public' in cache_control:
+            return True
+        user = getattr(request, 'user', None)
+        return (
+            'HTTP_AUTHORIZATION' not in request.META
+            and not (user and user.is_authenticated)
+        )
+
+    def should_compress(self, response):
+        if (
+            response.has_header('Content-Encoding')
+            or response.status_code in (204, 206, 304)
+        ):
+            return False
+        if not compression.is_compressible(response.get('Content-Type', '')):
+            return False
+        return (
+            response.streaming
+            or len(response.content) >= settings.COMPRESSION_MIN_SIZE
+        )
+
+
+# После успешной записи закрепляет пользователя за основной БД
+# на REPLICA_PIN_SECONDS: он сразу видит свои изменения
+class ReplicaPinMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            request.method not in ('GET', 'HEAD', 'OPTIONS')
+            and response.status_code < 400
+        ):
+            # DRF передаёт пользователя, найденного по токену, в request Django
+            db_router.pin(request.user)
+        return response
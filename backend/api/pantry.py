@@ -0,0 +1,153 @@
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.models import RecipeIngredient
+
+REBUILD_KEY = 'pantry-index-rebuild'
+
+# Составы всех рецептов в виде CSR: отсортированные id рецептов, границы
+# их составов в ingredients и сами id ингредиентов
+PantryData = namedtuple('PantryData', ['recipe_ids', 'indptr', 'ingredients'])
+EMPTY = PantryData(
+    np.empty(0, dtype=np.int64),
+    np.zeros(1, dtype=np.int64),
+    np.empty(0, dtype=np.int64),
+)
+
+
+def claim_rebuild():
+    # Не больше одной пересборки за PANTRY_INDEX_MIN_AGE секунд, сколько бы
+    # рецептов ни поменялось за это время
+    return cache.add(REBUILD_KEY, 1, settings.PANTRY_INDEX_MIN_AGE)
+
+
+def release_rebuild():
+    # Изменения, пришедшие после начала сканирования, закажут новую сборку
+    cache.delete(REBUILD_KEY)
+
+
+def build_data():
+    rows = RecipeIngredient.objects.order_by(
+        'recipe_id', 'ingredient_id'
+    ).values_list('recipe_id', 'ingredient_id')
+    # Пары пишутся сразу в массив, без промежуточного списка кортежей
+    pairs = np.fromiter(
+        chain.from_iterable(rows.iterator(chunk_size=10_000)),
+        dtype=np.int64
+    ).reshape(-1, 2)
+    recipe_ids, starts = np.unique(pairs[:, 0], return_index=True)
+    return PantryData(
+        recipe_ids,
+        np.append(starts, len(pairs)).astype(np.int64),
+        pairs[:, 1].copy(),
+    )
+
+
+def write_index(path=None):
+    # Полный проход по составам — один на все процессы (задача или команда
+    # build_pantry_index). Файл подменяется целиком: недописанный индекс
+    # никто не прочитает
+    path = path or settings.PANTRY_INDEX_FILE
+    data = build_data()
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.npz')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            np.savez(file, **data._asdict())
+        os.replace(temp_path, path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return data
+
+
+# Индекс составов в памяти процесса, прочитанный из файла write_index
+class PantryIndex:
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = None
+        self.version = None
+
+    def file_version(self):
+        try:
+            stat = os.stat(self.path or settings.PANTRY_INDEX_FILE)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def load(self, version):
+        data = EMPTY
+        if version is not None:
+            with np.load(self.path or settings.PANTRY_INDEX_FILE) as arrays:
+                data = PantryData(*(arrays[name] for name in EMPTY._fields))
+        # Запрос берёт self.data один раз и видит либо старый индекс
+        # целиком, либо новый
+        self.data, self.version = data, version
+
+    def reload(self, version):
+        try:
+            self.load(version)
+        finally:
+            self.lock.release()
+
+    def get(self):
+        version = self.file_version()
+        if self.data is None:
+            with self.lock:
+                if self.data is None:
+                    self.load(version)
+            if version is None and claim_rebuild():
+                # Файла ещё нет: его соберёт воркер. Импорт здесь, потому
+                # что задачи сами используют этот модуль
+                from .tasks import rebuild_pantry_index
+                rebuild_pantry_index.delay()
+        elif version != self.version and self.lock.acquire(blocking=False):
+            # Новый файл читается в фоне, запросы пока обслуживает прежний
+            # индекс
+            threading.Thread(
+                target=self.reload, args=(version,), daemon=True
+            ).start()
+        return self.data
+
+    def score(self, pantry, limit, max_missing=None):
+        # Доля ингредиентов рецепта, которые уже есть у пользователя
+        data = self.get()
+        if not len(data.recipe_ids):
+            return []
+        # Массив размечается по id ингредиентов из индекса: id вне этого
+        # диапазона не встречаются ни в одном рецепте
+        size = int(data.ingredients.max()) + 1
+        pantry = [item for item in pantry if 0 < item < size]
+        if not pantry:
+            return []
+        available = np.zeros(size, dtype=np.int32)
+        available[pantry] = 1
+        hits = np.add.reduceat(available[data.ingredients], data.indptr[:-1])
+        totals = np.diff(data.indptr)
+        missing = totals - hits
+
+        candidates = np.flatnonzero(hits)
+        if max_missing is not None:
+            candidates = candidates[missing[candidates] <= max_missing]
+        coverage = hits[candidates] / totals[candidates]
+        # Сначала полнота покрытия, затем меньше недостающих,
+        # затем новые рецепты
+        order = np.lexsort((
+            -data.recipe_ids[candidates], missing[candidates], -coverage
+        ))[:limit]
+        return [
+            (int(data.recipe_ids[i]), float(coverage[j]), int(missing[i]))
+            for i, j in zip(candidates[order], order)
+        ]
+
+
+pantry_index = PantryIndex()
@@ -0,0 +1,63 @@
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import (
+    Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+)
+
+# Модуль импортируется в процессах пула рендеринга, поэтому не трогает
+# Django: на вход получает готовые строки, на выходе отдаёт байты PDF
+FONT_NAME = 'ShoppingListFont'
+
+
+def register_font(font_path):
+    # Встроенные шрифты PDF не содержат кириллицы
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
+
+
+def render_shopping_list(title, rows, font_path):
+    register_font(font_path)
+    styles = getSampleStyleSheet()
+    heading = styles['Heading1'].clone(
+        'ShoppingListTitle', fontName=FONT_NAME
+    )
+    cell = styles['BodyText'].clone(
+        'ShoppingListCell', fontName=FONT_NAME, fontSize=10
+    )
+
+    data = [['№', 'Ингредиент', 'Количество', 'Ед. изм.']]
+    for number, (name, unit, amount) in enumerate(rows, start=1):
+        data.append([number, Paragraph(escape(name), cell), amount, unit])
+    table = Table(
+        data, colWidths=[12 * mm, 100 * mm, 30 * mm, 28 * mm], repeatRows=1
+    )
+    table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), FONT_NAME),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e8e8e8')),
+        (
+            'ROWBACKGROUNDS', (0, 1), (-1, -1),
+            [colors.white, colors.HexColor('#f7f7f7')]
+        ),
+        ('LINEBELOW', (0, 0), (-1, 0), 0.8, colors.grey),
+        ('ALIGN', (2, 1), (2, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+
+    buffer = BytesIO()
+    document = SimpleDocTemplate(
+        buffer, pagesize=A4, title=title,
+        leftMargin=15 * mm, rightMargin=15 * mm,
+        topMargin=15 * mm, bottomMargin=15 * mm,
+    )
+    document.build(
+        [Paragraph(escape(title), heading), Spacer(1, 5 * mm), table]
+    )
+    return buffer.getvalue()
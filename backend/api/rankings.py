@@ -0,0 +1,124 @@
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from recipes.models import Change, Favorite, RecipePopularity, ShoppingCart
+
+# Точка отсчёта для затухания: счёт хранится как логарифм суммы
+# exp(rate * (t - EPOCH)), поэтому старые строки не нужно пересчитывать
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+BATCH_SIZE = 1000
+
+
+def get_event_weights():
+    return (
+        (Favorite, settings.RANKING_FAVORITE_WEIGHT),
+        (ShoppingCart, settings.RANKING_CART_WEIGHT),
+    )
+
+
+def logaddexp(a, b):
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def collect_trending(since, until):
+    # Вклад новых событий в логарифмический счёт каждого рецепта
+    rate = math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+    scores = {}
+    for model, weight in get_event_weights():
+        events = model.objects.filter(created_at__lte=until)
+        if since is not None:
+            events = events.filter(created_at__gt=since)
+        for recipe_id, created_at in events.values_list(
+            'recipe_id', 'created_at'
+        ).iterator(chunk_size=10_000):
+            seconds = (created_at - EPOCH).total_seconds()
+            value = rate * seconds + math.log(weight)
+            scores[recipe_id] = logaddexp(scores.get(recipe_id), value)
+    return scores
+
+
+def collect_removed(since, until):
+    # Рецепты, которые за окно убрали из избранного или корзины: их
+    # popular_score пересчитывается и уменьшается
+    removed = Change.objects.filter(
+        kind__in=[Change.FAVORITE, Change.CART], deleted=True,
+        created_at__lte=until
+    )
+    if since is not None:
+        removed = removed.filter(created_at__gt=since)
+    return set(removed.values_list('object_id', flat=True).distinct())
+
+
+def count_popular(recipe_ids):
+    totals = dict.fromkeys(recipe_ids, 0.0)
+    for model, weight in get_event_weights():
+        counts = model.objects.filter(recipe_id__in=recipe_ids).values(
+            'recipe_id'
+        ).annotate(total=Count('id')).values_list('recipe_id', 'total')
+        for recipe_id, total in counts:
+            totals[recipe_id] += weight * total
+    return totals
+
+
+def update_rankings(full=False):
+    # Пересчитывает рейтинги только рецептов с новыми или удалёнными
+    # событиями. Окно заканчивается RANKING_SAFETY_LAG секунд назад:
+    # событие, чья транзакция ещё не закоммичена, попадёт в следующий
+    # запуск. updated_at хранит конец окна — курсор следующего запуска
+    until = timezone.now() - timedelta(seconds=settings.RANKING_SAFETY_LAG)
+    since = None
+    if not full:
+        since = RecipePopularity.objects.aggregate(
+            last=Max('updated_at')
+        )['last']
+    trending = collect_trending(since, until)
+    recipe_ids = sorted(set(trending) | collect_removed(since, until))
+    updated = 0
+
+    with transaction.atomic():
+        if full:
+            RecipePopularity.objects.all().delete()
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            batch = recipe_ids[start:start + BATCH_SIZE]
+            existing = dict(
+                RecipePopularity.objects.filter(recipe_id__in=batch)
+                .values_list('recipe_id', 'trending_score')
+            )
+            # Удаление без строки рейтинга уменьшать нечего
+            batch = [
+                recipe_id for recipe_id in batch
+                if recipe_id in trending or recipe_id in existing
+            ]
+            popular = count_popular(batch)
+            updated += len(batch)
+            RecipePopularity.objects.bulk_create(
+                [
+                    RecipePopularity(
+                        recipe_id=recipe_id,
+                        popular_score=popular[recipe_id],
+                        trending_score=(
+                            logaddexp(
+                                existing.get(recipe_id), trending[recipe_id]
+                            )
+                            if recipe_id in trending
+                            else existing[recipe_id]
+                        ),
+                        updated_at=until,
+                    )
+                    for recipe_id in batch
+                ],
+                update_conflicts=True,
+                unique_fields=['recipe'],
+                update_fields=[
+                    'popular_score', 'trending_score', 'updated_at'
+                ],
+            )
+    return updated
@@ -0,0 +1,64 @@
+import msgpack
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Типы, которых нет в orjson и msgpack (Decimal, ленивые строки, QuerySet
+# и т. п.), кодируются так же, как стандартным JSONRenderer DRF
+drf_default = JSONEncoder().default
+
+# Даты отдаём кодировщику DRF: он пишет UTC как «Z», orjson — как «+00:00»
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+# JSON через orjson; ответ совпадает с rest_framework.renderers.JSONRenderer
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            # orjson умеет только отступ в два пробела
+            options |= orjson.OPT_INDENT_2
+        content = orjson.dumps(data, default=drf_default, option=options)
+        # Как и DRF, экранируем разделители строк, недопустимые в JavaScript
+        return content.replace(
+            b'\xe2\x80\xa8', b'\\u2028'
+        ).replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class ORJSONParser(BaseParser):
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+# MessagePack для мобильного клиента: выбирается по Accept / Content-Type
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=drf_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError) as exc:
+            raise ParseError(
+                f'MessagePack parse error - {exc or type(exc).__name__}'
+            )
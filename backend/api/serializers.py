@@ -1,16 +1,20 @@
 import base64
-import uuid
 
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
+from django.db import transaction
+from django.urls import reverse
 from rest_framework import serializers
 
 from recipes.models import (
     Recipe, Ingredient, RecipeIngredient,
-    Favorite, ShoppingCart
+    Favorite, ShoppingCart, ShoppingListItem, ShoppingListPDF
 )
+from recipes.signals import ingredients_changed
 from users.models import Subscription
 
+from .tasks import delete_unused_file
+
 User = get_user_model()
 
 
@@ -28,10 +32,21 @@ class UserSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         # Проверяет, подписан ли текущий пользователь на данного
+        subscribed = getattr(obj, 'subscribed', None)
+        if subscribed is not None:
+            return subscribed
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
-        return Subscription.objects.filter(user=user, author=obj).exists()
+        # Контекст общий для всего дерева сериализаторов: подписки
+        # загружаются один раз, сколько бы авторов ни было в ответе
+        if 'subscribed_ids' not in self.context:
+            self.context['subscribed_ids'] = set(
+                Subscription.objects.filter(user=user).values_list(
+                    'author_id', flat=True
+                )
+            )
+        return obj.pk in self.context['subscribed_ids']
 
 
 # Сериализатор регистрации пользователя
@@ -56,8 +71,8 @@ class Base64ImageField(serializers.ImageField):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
-            filename = f'{uuid.uuid4().hex[:10]}.{ext}'
-            data = ContentFile(base64.b64decode(imgstr), name=filename)
+            # Итоговое имя файла хранилище выводит из хэша содержимого
+            data = ContentFile(base64.b64decode(imgstr), name=f'image.{ext}')
         return super().to_internal_value(data)
 
 
@@ -94,6 +109,17 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'measurement_unit', 'amount']
 
 
+# Поля короткого представления рецепта
+SHORT_RECIPE_FIELDS = ['id', 'name', 'image', 'cooking_time']
+
+
+# Короткое представление рецепта для корзины, избранного и подписок
+class ShortRecipeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Recipe
+        fields = SHORT_RECIPE_FIELDS
+
+
 # Основной сериализатор рецепта
 class RecipeSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
@@ -139,32 +165,63 @@ class RecipeSerializer(serializers.ModelSerializer):
         ingredients_data = validated_data.pop('ingredient_amounts')
         recipe = Recipe.objects.create(**validated_data)
         self.create_ingredients(recipe, ingredients_data)
+        ingredients_changed.send(sender=Recipe, recipe=recipe, previous={})
         return recipe
 
     def update(self, instance, validated_data):
         # Обновление рецепта и ингредиентов
         ingredients_data = validated_data.pop('ingredient_amounts', None)
         if ingredients_data:
-            instance.ingredient_amounts.all().delete()
-            self.create_ingredients(instance, ingredients_data)
-        return super().update(instance, validated_data)
-
+            # Новый состав и поправка списков покупок фиксируются вместе:
+            # иначе сбой между ними рассинхронизировал бы агрегат
+            with transaction.atomic():
+                previous = dict(instance.ingredient_amounts.values_list(
+                    'ingredient_id', 'amount'
+                ))
+                instance.ingredient_amounts.all().delete()
+                self.create_ingredients(instance, ingredients_data)
+                ingredients_changed.send(
+                    sender=Recipe, recipe=instance, previous=previous
+                )
+        old_image = instance.image.name
+        instance = super().update(instance, validated_data)
+        if instance.image.name != old_image:
+            delete_unused_file.delay(name=old_image)
+        return instance
+
+
+# Позиция агрегированного списка покупок
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
 
-# Сериализатор короткой ссылки
-class ShortLinkSerializer(serializers.Serializer):
-    shortLink = serializers.CharField(max_length=200)
+    class Meta:
+        model = ShoppingListItem
+        fields = ['id', 'name', 'measurement_unit', 'amount']
 
 
-# Сериализатор избранного рецепта
-class FavoriteSerializer(serializers.ModelSerializer):
-    id = serializers.ReadOnlyField(source='recipe.id')
-    name = serializers.ReadOnlyField(source='recipe.name')
-    image = serializers.ImageField(source='recipe.image')
-    cooking_time = serializers.ReadOnlyField(source='recipe.cooking_time')
+# Состояние задания на рендеринг PDF списка покупок
+class ShoppingListPDFSerializer(serializers.ModelSerializer):
+    download = serializers.SerializerMethodField()
 
     class Meta:
-        model = Favorite
-        fields = ['id', 'name', 'image', 'cooking_time']
+        model = ShoppingListPDF
+        fields = ['id', 'status', 'created_at', 'finished_at', 'download']
+
+    def get_download(self, obj):
+        if obj.status != ShoppingListPDF.DONE:
+            return None
+        return self.context['request'].build_absolute_uri(
+            reverse('recipes-shopping-list-pdf-file', args=[obj.pk])
+        )
+
+
+# Сериализатор короткой ссылки
+class ShortLinkSerializer(serializers.Serializer):
+    shortLink = serializers.CharField(max_length=200)
 
 
 # Сериализатор подписки на пользователя
@@ -194,10 +251,10 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         # Получает список рецептов автора с лимитом
         request = self.context.get('request')
         recipes_limit = request.query_params.get('recipes_limit')
-        queryset = obj.author.recipes.all()
+        queryset = obj.author.recipes.only(*SHORT_RECIPE_FIELDS)
         if recipes_limit:
             queryset = queryset[:int(recipes_limit)]
-        serializer = RecipeSerializer(
+        serializer = ShortRecipeSerializer(
             queryset, many=True, context={'request': request}
         )
         return serializer.data
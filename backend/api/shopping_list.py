@@ -0,0 +1,205 @@
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from recipes.models import (
+    RecipeIngredient, ShoppingCart, ShoppingListItem, ShoppingListPDF
+)
+
+from .pdf import render_shopping_list
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+_pool = None
+
+
+def get_composition(recipe):
+    return dict(
+        recipe.ingredient_amounts.values_list('ingredient_id', 'amount')
+    )
+
+
+def apply_delta(user_ids, delta):
+    # Прибавляет delta {ingredient_id: количество} к спискам покупок
+    # пользователей
+    delta = {key: value for key, value in delta.items() if value}
+    if not delta or not user_ids:
+        return
+    user_ids = sorted(set(user_ids))
+    with transaction.atomic():
+        # Блокировка строк пользователей упорядочивает параллельные изменения
+        list(
+            User.objects.select_for_update().filter(pk__in=user_ids)
+            .values_list('pk')
+        )
+        existing = {
+            (item.user_id, item.ingredient_id): item
+            for item in ShoppingListItem.objects.filter(
+                user_id__in=user_ids, ingredient_id__in=delta
+            )
+        }
+        to_create, to_update, to_delete = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, amount in delta.items():
+                item = existing.get((user_id, ingredient_id))
+                if item is None:
+                    if amount > 0:
+                        to_create.append(ShoppingListItem(
+                            user_id=user_id, ingredient_id=ingredient_id,
+                            amount=amount
+                        ))
+                    continue
+                item.amount += amount
+                if item.amount > 0:
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.pk)
+        ShoppingListItem.objects.bulk_create(to_create)
+        ShoppingListItem.objects.bulk_update(to_update, ['amount'])
+        ShoppingListItem.objects.filter(pk__in=to_delete).delete()
+
+
+def add_recipe(user, recipe):
+    apply_delta([user.pk], get_composition(recipe))
+
+
+def remove_recipe(user, recipe):
+    apply_delta([user.pk], {
+        ingredient_id: -amount
+        for ingredient_id, amount in get_composition(recipe).items()
+    })
+
+
+def apply_to_carts(recipe, delta):
+    # Изменение состава рецепта у всех, у кого он в корзине
+    user_ids = list(
+        ShoppingCart.objects.filter(recipe=recipe)
+        .values_list('user_id', flat=True)
+    )
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        apply_delta(user_ids[start:start + BATCH_SIZE], delta)
+
+
+def recipe_changed(recipe, previous):
+    current = get_composition(recipe)
+    delta = {
+        ingredient_id:
+            current.get(ingredient_id, 0) - previous.get(ingredient_id, 0)
+        for ingredient_id in current.keys() | previous.keys()
+    }
+    apply_to_carts(recipe, delta)
+
+
+def rebuild(user):
+    # Полный пересчёт агрегата по корзине пользователя
+    totals = RecipeIngredient.objects.filter(
+        recipe__shopping_cart__user=user
+    ).values('ingredient_id').annotate(total=Sum('amount'))
+    with transaction.atomic():
+        ShoppingListItem.objects.filter(user=user).delete()
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(
+                user=user, ingredient_id=row['ingredient_id'],
+                amount=row['total']
+            )
+            for row in totals
+        )
+
+
+def get_rows(user):
+    return list(ShoppingListItem.objects.filter(user=user).order_by(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'amount'
+    ))
+
+
+def cart_hash(user, rows):
+    digest = hashlib.sha256(user.username.encode())
+    for name, unit, amount in rows:
+        digest.update(f'\0{name}\0{unit}\0{amount}'.encode())
+    return digest.hexdigest()
+
+
+def request_pdf(user):
+    # Готовый PDF для той же корзины отдаётся сразу, иначе ставится задание
+    rows = get_rows(user)
+    digest = cart_hash(user, rows)
+    stale = timezone.now() - timedelta(seconds=settings.PDF_RENDER_TIMEOUT)
+    job = ShoppingListPDF.objects.filter(
+        user=user, cart_hash=digest
+    ).exclude(status=ShoppingListPDF.FAILED).first()
+    if job is not None:
+        if job.status == ShoppingListPDF.DONE or job.created_at > stale:
+            return job
+        # Задание потерялось вместе с процессом, который его ставил
+        job.delete()
+    job = ShoppingListPDF.objects.create(user=user, cart_hash=digest)
+    title = f'Список покупок для {user.username}'
+    transaction.on_commit(partial(submit, job.pk, title, rows))
+    return job
+
+
+def get_pool():
+    # spawn, а не fork: дочерним процессам не нужны соединения и потоки воркера
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.PDF_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _pool
+
+
+def submit(job_id, title, rows):
+    global _pool
+    args = (render_shopping_list, title, rows, settings.PDF_FONT_PATH)
+    try:
+        future = get_pool().submit(*args)
+    except BrokenProcessPool:
+        _pool = None
+        future = get_pool().submit(*args)
+    future.add_done_callback(partial(finish_pdf, job_id))
+
+
+def finish_pdf(job_id, future):
+    # Вызывается в служебном потоке пула, поэтому соединение с БД
+    # закрываем сами
+    try:
+        job = ShoppingListPDF.objects.filter(pk=job_id).first()
+        if job is None:
+            return
+        try:
+            content = future.result()
+        except Exception as error:
+            job.status = ShoppingListPDF.FAILED
+            job.error = repr(error)
+        else:
+            job.file.save(
+                f'{job.cart_hash}.pdf', ContentFile(content), save=False
+            )
+            job.status = ShoppingListPDF.DONE
+        job.finished_at = timezone.now()
+        job.save()
+        if job.status == ShoppingListPDF.DONE:
+            # Файлы для прежнего состава корзины больше не понадобятся
+            previous = ShoppingListPDF.objects.filter(
+                user_id=job.user_id
+            ).exclude(pk=job.pk).exclude(status=ShoppingListPDF.PENDING)
+            for old in previous:
+                old.file.delete(save=False)
+                old.delete()
+    finally:
+        connection.close()
@@ -0,0 +1,143 @@
+import random
+import string
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.models import Recipe
+
+VERSION_KEY = 'short-links-version'
+EVENT_KEY = 'short-links-event:{}'
+# Если пропущено больше событий, карту дешевле собрать заново
+MAX_EVENTS = 1000
+MAX_CODE_LENGTH = 11  # 62 ** 11 > 2 ** 64
+
+
+def get_alphabet():
+    # Порядок символов перемешан солью: коды не совпадают с base62 от id
+    # и не подбираются перебором по порядку. Смена соли ломает выданные ссылки
+    alphabet = list(string.digits + string.ascii_letters)
+    random.Random(settings.SHORT_LINK_SALT).shuffle(alphabet)
+    return ''.join(alphabet)
+
+
+ALPHABET = get_alphabet()
+POSITIONS = {char: position for position, char in enumerate(ALPHABET)}
+
+
+def encode(recipe_id):
+    if recipe_id <= 0:
+        raise ValueError('id должен быть положительным')
+    chars = []
+    while recipe_id:
+        recipe_id, remainder = divmod(recipe_id, len(ALPHABET))
+        chars.append(ALPHABET[remainder])
+    return ''.join(reversed(chars))
+
+
+def decode(code):
+    # None для строк, которые не могли быть выданы encode
+    if not code or len(code) > MAX_CODE_LENGTH or code[0] == ALPHABET[0]:
+        return None
+    recipe_id = 0
+    for char in code:
+        position = POSITIONS.get(char)
+        if position is None:
+            return None
+        recipe_id = recipe_id * len(ALPHABET) + position
+    return recipe_id
+
+
+def record_change(recipe_id, present):
+    # Рецепт создан (present) или удалён: процессы поправят у себя один бит.
+    # Событие живёт SHORT_LINK_INDEX_TTL — дольше карта и так не доживает
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        # Счётчик пропал из кэша: новый отсчёт с метки времени, чтобы номер
+        # не совпал с версией, которую процессы уже прочитали
+        version = time.time_ns() // 1_000_000
+        cache.set(VERSION_KEY, version, None)
+    cache.set(
+        EVENT_KEY.format(version), (recipe_id, present),
+        settings.SHORT_LINK_INDEX_TTL
+    )
+
+
+# Битовая карта существующих id рецептов в памяти процесса: переходы по
+# коротким ссылкам и выдача ссылок не обращаются к БД. Изменения
+# применяются по одному биту, полная пересборка — раз в
+# SHORT_LINK_INDEX_TTL или если часть событий уже не найти в кэше
+class RecipeIds:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.built_at = 0
+        self.bits = bytearray()
+
+    def is_stale(self):
+        return (
+            time.monotonic() - self.built_at > settings.SHORT_LINK_INDEX_TTL
+            or cache.get(VERSION_KEY, 0) != self.version
+        )
+
+    def refresh(self):
+        version = cache.get(VERSION_KEY, 0)
+        if (
+            self.version is None or version < self.version
+            or version - self.version > MAX_EVENTS
+            or time.monotonic() - self.built_at > settings.SHORT_LINK_INDEX_TTL
+        ):
+            self.build()
+            return
+        keys = [
+            EVENT_KEY.format(number)
+            for number in range(self.version + 1, version + 1)
+        ]
+        events = cache.get_many(keys)
+        if len(events) < len(keys):
+            self.build()
+            return
+        for key in keys:
+            self.set(*events[key])
+        self.version = version
+
+    def set(self, recipe_id, present):
+        byte = recipe_id >> 3
+        if byte >= len(self.bits):
+            if not present:
+                return
+            self.bits.extend(bytes(byte - len(self.bits) + 1))
+        if present:
+            self.bits[byte] |= 1 << (recipe_id & 7)
+        else:
+            self.bits[byte] &= ~(1 << (recipe_id & 7)) & 0xFF
+
+    def build(self):
+        version = cache.get(VERSION_KEY, 0)
+        ids = list(
+            Recipe.objects.values_list('id', flat=True)
+            .iterator(chunk_size=10_000)
+        )
+        bits = bytearray(max(ids, default=0) // 8 + 1)
+        for recipe_id in ids:
+            bits[recipe_id >> 3] |= 1 << (recipe_id & 7)
+        self.bits = bits
+        self.version = version
+        self.built_at = time.monotonic()
+
+    def __contains__(self, recipe_id):
+        if self.is_stale():
+            with self.lock:
+                if self.is_stale():
+                    self.refresh()
+        byte = recipe_id >> 3
+        return (
+            0 < recipe_id and byte < len(self.bits)
+            and bool(self.bits[byte] & 1 << (recipe_id & 7))
+        )
+
+
+recipe_ids = RecipeIds()
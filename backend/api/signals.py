@@ -0,0 +1,105 @@
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, Recipe
+from recipes.signals import ingredients_changed
+
+from . import catalog, pantry, shopping_list, short_links, sync
+from .tasks import (
+    delete_unused_file, index_recipe_similarity, rebuild_pantry_index
+)
+
+User = get_user_model()
+
+
+@receiver(ingredients_changed)
+@receiver(post_delete, sender=Recipe)
+def invalidate_pantry_index(sender, **kwargs):
+    # Пауза перед сборкой собирает в один проход все правки за это время
+    if pantry.claim_rebuild():
+        rebuild_pantry_index.delay(countdown=settings.PANTRY_INDEX_MIN_AGE)
+
+
+@receiver(post_save, sender=Recipe)
+def add_short_link(sender, instance, created, **kwargs):
+    # После коммита: иначе процесс может увидеть id раньше, чем рецепт
+    # станет виден в БД
+    if created:
+        transaction.on_commit(
+            partial(short_links.record_change, instance.pk, True)
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_short_link(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(short_links.record_change, instance.pk, False)
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_catalog(sender, **kwargs):
+    transaction.on_commit(catalog.bump_version)
+
+
+@receiver(ingredients_changed)
+def update_similarity_index(sender, recipe, **kwargs):
+    index_recipe_similarity.delay(recipe_id=recipe.pk)
+
+
+@receiver(ingredients_changed)
+def update_shopping_lists(sender, recipe, previous, **kwargs):
+    shopping_list.recipe_changed(recipe, previous)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_from_shopping_lists(sender, instance, **kwargs):
+    composition = shopping_list.get_composition(instance)
+    shopping_list.apply_to_carts(instance, {
+        ingredient_id: -amount
+        for ingredient_id, amount in composition.items()
+    })
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_image(sender, instance, **kwargs):
+    delete_unused_file.delay(name=instance.image.name)
+
+
+@receiver(post_delete, sender=User)
+def delete_user_avatar(sender, instance, **kwargs):
+    delete_unused_file.delay(name=instance.avatar.name)
+
+
+def record_change(sender, instance, created=False, update_fields=None,
+                  **kwargs):
+    # Обновление одного last_login при входе клиентам не интересно
+    if (
+        sender is User and update_fields
+        and set(update_fields) <= {'last_login'}
+    ):
+        return
+    sync.record(instance)
+
+
+def record_deletion(sender, instance, **kwargs):
+    sync.record(instance, deleted=True)
+
+
+# Подключаются только к отслеживаемым моделям: обработчик post_delete
+# отключает быстрое удаление у каждой модели, к которой привязан
+for model in sync.TRACKED:
+    post_save.connect(
+        record_change, sender=model,
+        dispatch_uid=f'sync_save_{model._meta.label}'
+    )
+    post_delete.connect(
+        record_deletion, sender=model,
+        dispatch_uid=f'sync_delete_{model._meta.label}'
+    )
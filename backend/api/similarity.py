@@ -0,0 +1,85 @@
+import hashlib
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+
+from recipes.models import RecipeIngredient, RecipeLSHBucket
+
+# 16 полос по 4 хеша: порог сходства по Жаккару около 0.5
+BANDS = 16
+ROWS = 4
+NUM_PERM = BANDS * ROWS
+PRIME = (1 << 31) - 1
+MAX_CANDIDATES = 500
+
+_rng = np.random.RandomState(1)
+_A = _rng.randint(1, PRIME, size=NUM_PERM).astype(np.int64)
+_B = _rng.randint(0, PRIME, size=NUM_PERM).astype(np.int64)
+
+
+def minhash(ingredient_ids):
+    # Минимумы NUM_PERM универсальных хешей по множеству ингредиентов
+    ids = np.asarray(sorted(ingredient_ids), dtype=np.int64)
+    hashes = (_A[:, None] * ids[None, :] + _B[:, None]) % PRIME
+    return hashes.min(axis=1)
+
+
+def band_keys(signature):
+    keys = []
+    for band in range(BANDS):
+        chunk = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(
+            band.to_bytes(2, 'little') + chunk.tobytes(), digest_size=8
+        ).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def get_compositions(recipe_ids):
+    compositions = {}
+    for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient_id'):
+        compositions.setdefault(recipe_id, set()).add(ingredient_id)
+    return compositions
+
+
+def index_recipes(recipe_ids):
+    # Пересобирает корзины LSH для переданных рецептов
+    compositions = get_compositions(recipe_ids)
+    buckets = [
+        RecipeLSHBucket(recipe_id=recipe_id, key=key)
+        for recipe_id, ingredients in compositions.items()
+        for key in band_keys(minhash(ingredients))
+    ]
+    with transaction.atomic():
+        RecipeLSHBucket.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeLSHBucket.objects.bulk_create(buckets)
+
+
+def similar_recipes(recipe_id, limit):
+    # Кандидаты — рецепты из общих корзин, итог — точный коэффициент Жаккара
+    keys = RecipeLSHBucket.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('key', flat=True)
+    candidates = list(
+        RecipeLSHBucket.objects.filter(key__in=keys)
+        .exclude(recipe_id=recipe_id)
+        .values('recipe_id')
+        .annotate(shared=Count('key'))
+        .order_by('-shared')
+        .values_list('recipe_id', flat=True)[:MAX_CANDIDATES]
+    )
+    if not candidates:
+        return []
+    compositions = get_compositions(candidates + [recipe_id])
+    source = compositions.get(recipe_id, set())
+    scores = []
+    for candidate in candidates:
+        ingredients = compositions.get(candidate, set())
+        union = len(source | ingredients)
+        if union:
+            scores.append((candidate, len(source & ingredients) / union))
+    scores.sort(key=lambda item: (-item[1], -item[0]))
+    return scores[:limit]
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+logger = logging.getLogger('api.slow_queries')
+
+_state = threading.local()
+
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    # Приводит запрос к шаблону: литералы и списки IN (...) схлопываются
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    return _SPACES_RE.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize_sql(sql).encode()).hexdigest()[:16]
+
+
+# Обёртка connection.execute_wrapper, записывающая медленные запросы
+class SlowQueryLogger:
+    def __init__(self, request=None):
+        self.request = request
+        self.threshold = settings.SLOW_QUERY_THRESHOLD_MS
+        self.sample_rate = settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+
+    def __call__(self, execute, sql, params, many, context):
+        # Запросы самого логгера (EXPLAIN) не перехватываем
+        if getattr(_state, 'active', False):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = (time.perf_counter() - start) * 1000
+        if duration >= self.threshold:
+            _state.active = True
+            try:
+                self.record(sql, params, many, context['connection'], duration)
+            finally:
+                _state.active = False
+        return result
+
+    def record(self, sql, params, many, connection, duration):
+        entry = {
+            'ts': timezone.now().isoformat(),
+            'alias': connection.alias,
+            'duration_ms': round(duration, 3),
+            'fingerprint': fingerprint(sql),
+            'sql': sql,
+            'params': None if many else params,
+            'many': many,
+            'plan': None,
+        }
+        entry.update(self.get_view_info())
+        if self.should_explain(sql, many, connection):
+            entry['plan'] = self.explain(sql, params, connection)
+        logger.warning(json.dumps(entry, ensure_ascii=False, default=str))
+
+    def get_view_info(self):
+        if self.request is None:
+            return {'view': None, 'method': None, 'path': None}
+        match = getattr(self.request, 'resolver_match', None)
+        return {
+            'view': match._func_path if match else None,
+            'method': self.request.method,
+            'path': self.request.path,
+        }
+
+    def should_explain(self, sql, many, connection):
+        # EXPLAIN ANALYZE повторно выполняет запрос, поэтому только для SELECT
+        return (
+            connection.vendor == 'postgresql'
+            and not many
+            and sql.lstrip().upper().startswith('SELECT')
+            and random.random() < self.sample_rate
+        )
+
+    def explain(self, sql, params, connection):
+        try:
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql,
+                        params
+                    )
+                    plan = cursor.fetchone()[0]
+        except DatabaseError as error:
+            return {'error': str(error)}
+        return json.loads(plan) if isinstance(plan, str) else plan
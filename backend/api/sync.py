@@ -0,0 +1,197 @@
+import base64
+import json
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, router
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.expressions import RawSQL
+
+from recipes.models import Change, Favorite, Ingredient, Recipe, ShoppingCart
+from users.models import Subscription
+
+from .catalog import CATALOG_FIELDS
+from .fast_serializers import (
+    RECIPE_VALUES, USER_VALUES, serialize_recipes, serialize_users,
+    subscribed_expression
+)
+
+User = get_user_model()
+
+# Модель -> (вид изменения, поле объекта, поле владельца личного изменения)
+TRACKED = {
+    Recipe: (Change.RECIPE, 'pk', None),
+    User: (Change.USER, 'pk', None),
+    Ingredient: (Change.INGREDIENT, 'pk', None),
+    Favorite: (Change.FAVORITE, 'recipe_id', 'user_id'),
+    ShoppingCart: (Change.CART, 'recipe_id', 'user_id'),
+    Subscription: (Change.SUBSCRIPTION, 'author_id', 'user_id'),
+}
+# Личные изменения: вид -> (ключ ответа, модель, поле объекта)
+PERSONAL = {
+    Change.FAVORITE: ('favorites', Favorite, 'recipe_id'),
+    Change.CART: ('shopping_cart', ShoppingCart, 'recipe_id'),
+    Change.SUBSCRIPTION: ('subscriptions', Subscription, 'author_id'),
+}
+# Запас на транзакции, которые пишут журнал дольше обычного: их записи
+# могут оказаться после курсора, хотя созданы до выдачи токена
+TOKEN_MARGIN = 3600
+
+
+class TokenExpired(Exception):
+    pass
+
+
+def current_txid(using):
+    # Номер транзакции, которая пишет запись. В PostgreSQL он задаёт порядок
+    # коммитов надёжнее id: id выдаются при вставке, а не при коммите
+    if connections[using].vendor != 'postgresql':
+        return 0
+    return RawSQL('pg_current_xact_id()::text::bigint', [])
+
+
+def commit_horizon(using):
+    # Транзакции с номером меньше горизонта уже завершены: записи с таким
+    # txid больше не появятся. Вне PostgreSQL запись блокирует базу до
+    # коммита, и порядок id совпадает с порядком коммитов
+    if connections[using].vendor != 'postgresql':
+        return None
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint'
+        )
+        return cursor.fetchone()[0]
+
+
+def record(instance, deleted=False):
+    # Пишется в транзакции изменения: откат убирает и запись журнала
+    kind, object_field, owner_field = TRACKED[type(instance)]
+    using = router.db_for_write(Change)
+    Change.objects.using(using).create(
+        kind=kind,
+        object_id=getattr(instance, object_field),
+        owner_id=getattr(instance, owner_field) if owner_field else None,
+        deleted=deleted,
+        txid=current_txid(using),
+    )
+
+
+def encode_token(position):
+    # Позиция курсора (txid, id) и время выдачи токена
+    raw = json.dumps([*position, int(time.time())]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_token(token):
+    try:
+        txid, change_id, issued_at = json.loads(
+            base64.urlsafe_b64decode(token.encode())
+        )
+        return (int(txid), int(change_id)), int(issued_at)
+    except (TypeError, ValueError):
+        raise ValueError('invalid sync token')
+
+
+def after(position):
+    txid, change_id = position
+    return Q(txid__gt=txid) | Q(txid=txid, id__gt=change_id)
+
+
+def visible_changes():
+    # Только записи завершённых транзакций: запись ещё открытой транзакции
+    # может оказаться позади курсора, и клиент перескочил бы через неё
+    changes = Change.objects.all()
+    horizon = commit_horizon(changes.db)
+    if horizon is not None:
+        changes = changes.filter(txid__lt=horizon)
+    return changes
+
+
+def last_position(changes):
+    return changes.order_by('-txid', '-id').values_list('txid', 'id').first()
+
+
+def check_retained(issued_at):
+    # prune_change_log удаляет записи старше срока хранения. Записи после
+    # курсора появились не раньше выдачи токена (с поправкой на длину
+    # транзакции), поэтому токен младше срока хранения ничего не пропустит
+    lifetime = settings.SYNC_RETENTION_DAYS * 24 * 3600 - TOKEN_MARGIN
+    if issued_at < time.time() - lifetime:
+        raise TokenExpired
+
+
+def head_token():
+    # Токен «с этого момента»: клиент берёт его до полной загрузки данных
+    return encode_token(last_position(visible_changes()) or (0, 0))
+
+
+def get_changes(request, since, issued_at, limit):
+    # Страница журнала после курсора since; ответ строится по текущему
+    # состоянию, поэтому повторные правки одного объекта схлопываются
+    check_retained(issued_at)
+    user = request.user
+    changes = visible_changes().filter(after(since))
+    relevant = Q(owner_id__isnull=True)
+    if user.is_authenticated:
+        relevant |= Q(owner_id=user.pk)
+    rows = list(
+        changes.filter(relevant).order_by('txid', 'id')
+        .values_list('txid', 'id', 'kind', 'object_id')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if has_more:
+        position = rows[-1][:2]
+    else:
+        # Журнал просмотрен до конца: чужие личные записи тоже пропускаем
+        position = last_position(changes) or since
+
+    ids = defaultdict(set)
+    for _, _, kind, object_id in rows:
+        ids[kind].add(object_id)
+
+    recipes = list(
+        Recipe.objects.filter(pk__in=ids[Change.RECIPE])
+        .values(*RECIPE_VALUES)
+    )
+    users = list(User.objects.filter(pk__in=ids[Change.USER]).annotate(
+        subscribed=subscribed_expression(request),
+        is_author=Exists(Recipe.objects.filter(author=OuterRef('pk'))),
+    ).values(*USER_VALUES, 'subscribed', 'is_author'))
+    ingredients = list(
+        Ingredient.objects.filter(pk__in=ids[Change.INGREDIENT])
+        .values(*CATALOG_FIELDS)
+    )
+    # Из пользователей клиенту интересны авторы рецептов и он сам
+    visible_users = [
+        row for row in users if row['is_author'] or row['id'] == user.pk
+    ]
+    data = {
+        'next': encode_token(position),
+        'has_more': has_more,
+        'recipes': serialize_recipes(recipes, request),
+        'deleted_recipes': deleted_ids(ids[Change.RECIPE], recipes),
+        'users': serialize_users(visible_users, request),
+        'deleted_users': deleted_ids(ids[Change.USER], users),
+        'ingredients': ingredients,
+        'deleted_ingredients': deleted_ids(
+            ids[Change.INGREDIENT], ingredients
+        ),
+    }
+    for kind, (key, model, field) in PERSONAL.items():
+        current = set()
+        if user.is_authenticated and ids[kind]:
+            current = set(model.objects.filter(
+                user=user, **{f'{field}__in': ids[kind]}
+            ).values_list(field, flat=True))
+        data[key] = {
+            'added': sorted(current), 'removed': sorted(ids[kind] - current)
+        }
+    return data
+
+
+def deleted_ids(changed, rows):
+    # Изменённые id, которых больше нет в таблице
+    return sorted(changed - {row['id'] for row in rows})
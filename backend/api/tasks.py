@@ -0,0 +1,95 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from foodgram.storage import image_storage, modified_before
+from recipes.models import Recipe
+from tasks.queue import task
+from users.models import Subscription
+
+from . import deletion, feed, pantry, similarity
+
+User = get_user_model()
+
+
+@task()
+def fan_out_recipe(recipe_id):
+    recipe = Recipe.objects.select_related('author').filter(
+        pk=recipe_id
+    ).first()
+    if recipe is not None:
+        feed.fan_out(recipe)
+
+
+@task()
+def sync_subscription(user_id, author_id):
+    # Смотрит на текущее состояние подписки, а не на событие, поэтому
+    # быстрые «подписаться — отписаться» можно выполнять в любом порядке
+    feed.reconcile_subscriber_counts([author_id])
+    author = User.objects.filter(pk=author_id).first()
+    if author is None:
+        return
+    if Subscription.objects.filter(user_id=user_id, author=author).exists():
+        feed.add_author(User(pk=user_id), author)
+    else:
+        feed.remove_author(user_id, author)
+
+
+@task()
+def rebuild_pantry_index():
+    pantry.release_rebuild()
+    pantry.write_index()
+
+
+@task()
+def index_recipe_similarity(recipe_id):
+    similarity.index_recipes([recipe_id])
+
+
+@task()
+def delete_unused_file(name):
+    # Один файл могут разделять несколько записей (например, общая заглушка)
+    if not name:
+        return
+    if (
+        Recipe.all_objects.filter(image=name).exists()
+        or User.objects.filter(avatar=name).exists()
+    ):
+        return
+    # Свежий файл может принадлежать загрузке, которая ещё не закоммичена;
+    # такие файлы позже соберёт gc_media
+    storage = image_storage()
+    cutoff = time.time() - settings.MEDIA_DELETE_MIN_AGE
+    if modified_before(storage, name, cutoff):
+        storage.delete(name)
+
+
+def run_steps(steps, requeue):
+    # Выполняет шаги, пока не истечёт бюджет задачи, а остаток ставит
+    # новой задачей: воркер не занят часами и не держит блокировку задачи
+    deadline = time.monotonic() + settings.DELETION_TASK_BUDGET
+    for _ in steps:
+        if time.monotonic() > deadline:
+            requeue()
+            return
+
+
+@task()
+def delete_recipe(recipe_id):
+    recipe = Recipe.all_objects.filter(pk=recipe_id).first()
+    if recipe is not None:
+        run_steps(
+            deletion.recipe_steps(recipe, settings.DELETION_BATCH_SIZE),
+            lambda: delete_recipe.delay(recipe_id=recipe_id),
+        )
+
+
+@task()
+def delete_user(user_id):
+    user = User.objects.filter(pk=user_id).first()
+    if user is not None:
+        run_steps(
+            deletion.user_steps(user, settings.DELETION_BATCH_SIZE),
+            lambda: delete_user.delay(user_id=user_id),
+        )
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from api import short_links
+from api.tasks import delete_recipe
+from recipes.models import Favorite, Recipe
+from tasks.models import Task
+
+User = get_user_model()
+
+
+class RecipeAdminDeletionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='secret',
+            first_name='Анна', last_name='Админова',
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.admin, name='Суп', text='Сварить', cooking_time=10,
+            image='recipes/images/soup.png',
+        )
+        for number in range(3):
+            fan = User.objects.create_user(
+                username=f'fan{number}', email=f'fan{number}@example.com',
+                password='secret', first_name='Фан', last_name='Фанов',
+            )
+            Favorite.objects.create(user=fan, recipe=self.recipe)
+        self.client.force_login(self.admin)
+        self.url = f'/admin/recipes/recipe/{self.recipe.pk}/delete/'
+
+    def test_confirmation_lists_only_recipes(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['deleted_objects'], ['Суп'])
+        self.assertEqual(
+            dict(response.context['model_count']), {'Рецепты': 1}
+        )
+
+    def test_delete_hides_recipe_and_queues_task(self):
+        self.assertIn(self.recipe.pk, short_links.recipe_ids)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Recipe.objects.filter(pk=self.recipe.pk).exists())
+        self.assertNotIn(self.recipe.pk, short_links.recipe_ids)
+        self.assertEqual(
+            self.client.get(f'/api/recipes/{self.recipe.pk}/').status_code,
+            404
+        )
+        self.assertEqual(Favorite.objects.count(), 3)
+        task = Task.objects.get()
+        self.assertEqual(task.kwargs, {'recipe_id': self.recipe.pk})
+
+        delete_recipe(**task.kwargs)
+        self.assertFalse(
+            Recipe.all_objects.filter(pk=self.recipe.pk).exists()
+        )
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_bulk_action_hides_selected_recipes(self):
+        other = Recipe.objects.create(
+            author=self.admin, name='Каша', text='Сварить', cooking_time=5,
+            image='recipes/images/porridge.png',
+        )
+        response = self.client.post('/admin/recipes/recipe/', {
+            'action': 'delete_selected', 'post': 'yes',
+            '_selected_action': [self.recipe.pk, other.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(Recipe.all_objects.count(), 2)
+        self.assertEqual(Task.objects.count(), 2)
@@ -0,0 +1,81 @@
+import gzip
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import compression
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class NegotiateTests(TestCase):
+    def test_prefers_highest_quality(self):
+        self.assertEqual(compression.negotiate('br;q=0.5, gzip'), 'gzip')
+
+    def test_ties_follow_server_order(self):
+        preferred = next(iter(compression.CODECS))
+        self.assertEqual(compression.negotiate('gzip, br, zstd'), preferred)
+        self.assertEqual(compression.negotiate('deflate, *;q=0.2'), preferred)
+
+    def test_refused_encodings(self):
+        self.assertIsNone(compression.negotiate('identity'))
+        self.assertIsNone(compression.negotiate('*;q=0'))
+        self.assertIsNone(compression.negotiate('gzip;q=bogus'))
+        self.assertIsNone(compression.negotiate(''))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=256)
+class CompressionMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='secret',
+            first_name='Иван', last_name='Иванов',
+        )
+        for number in range(5):
+            Recipe.objects.create(
+                author=self.user, name=f'Рецепт {number}',
+                text='Нарезать, смешать и запечь. ' * 20, cooking_time=30,
+                image='recipes/images/placeholder.png',
+            )
+        self.client = APIClient()
+
+    def get(self, accept_encoding='gzip'):
+        with mock.patch.object(compression.cache, 'set') as cache_set:
+            response = self.client.get(
+                '/api/recipes/', HTTP_ACCEPT_ENCODING=accept_encoding
+            )
+        self.assertEqual(response.status_code, 200)
+        return response, cache_set
+
+    def test_anonymous_response_is_compressed_and_cached(self):
+        plain, _ = self.get('identity')
+        response, cache_set = self.get()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(
+            int(response['Content-Length']), len(response.content)
+        )
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        cache_set.assert_called_once()
+
+    def test_personal_response_is_not_cached(self):
+        self.client.force_authenticate(self.user)
+        plain, _ = self.get('identity')
+        response, cache_set = self.get()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        cache_set.assert_not_called()
+
+    def test_without_accept_encoding_body_is_plain(self):
+        response, cache_set = self.get('')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        cache_set.assert_not_called()
+
+    def test_small_bodies_are_not_compressed(self):
+        with override_settings(COMPRESSION_MIN_SIZE=1024 * 1024):
+            response, _ = self.get()
+        self.assertFalse(response.has_header('Content-Encoding'))
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api import db_router
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+# Реплику изображает зеркало тестовой default (см. DATABASES в settings).
+# TransactionTestCase: данные закоммичены и видны обоим подключениям
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica_1'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='secret',
+            first_name='Иван', last_name='Иванов',
+        )
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com', password='secret',
+            first_name='Пётр', last_name='Петров',
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Суп', text='Сварить', cooking_time=10,
+            image='recipes/images/soup.png',
+        )
+        self.client = APIClient()
+
+    def get(self, url):
+        # Запросы, выполненные на каждой из баз за время GET
+        with CaptureQueriesContext(connections['default']) as default, \
+                CaptureQueriesContext(connections['replica_1']) as replica:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(default), len(replica)
+
+    def test_anonymous_read_goes_to_replica(self):
+        default, replica = self.get('/api/recipes/')
+        self.assertEqual(default, 0)
+        self.assertGreater(replica, 0)
+
+    def test_unpinned_user_reads_from_replica(self):
+        self.client.force_authenticate(self.user)
+        default, replica = self.get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(default, 0)
+        self.assertGreater(replica, 0)
+
+    def test_pinned_user_reads_from_default(self):
+        self.client.force_authenticate(self.user)
+        db_router.pin(self.user)
+        default, replica = self.get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertGreater(default, 0)
+        self.assertEqual(replica, 0)
+
+    def test_write_pins_user(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(db_router.is_pinned(self.user))
+        default, replica = self.get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(replica, 0)
+
+    def test_pin_is_per_user(self):
+        db_router.pin(self.author)
+        self.client.force_authenticate(self.user)
+        default, replica = self.get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(default, 0)
+        self.assertGreater(replica, 0)
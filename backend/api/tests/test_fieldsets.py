@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.fast_serializers import RECIPE_FIELDS
+from api.fieldsets import requested_fields
+from api.serializers import SHORT_RECIPE_FIELDS
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+User = get_user_model()
+
+
+class RequestedFieldsTests(TestCase):
+    def fields(self, path, method='get'):
+        request = Request(getattr(APIRequestFactory(), method)(path))
+        return requested_fields(request, SHORT_RECIPE_FIELDS, RECIPE_FIELDS)
+
+    def test_without_params_returns_full_representation(self):
+        self.assertIsNone(self.fields('/api/recipes/'))
+
+    def test_fields_are_taken_as_is(self):
+        self.assertEqual(
+            self.fields('/api/recipes/?fields=id, name,,text'),
+            {'id', 'name', 'text'}
+        )
+
+    def test_expand_extends_short_representation(self):
+        self.assertEqual(
+            self.fields('/api/recipes/?expand=author'),
+            set(SHORT_RECIPE_FIELDS) | {'author'}
+        )
+
+    def test_unknown_field_is_rejected(self):
+        with self.assertRaises(ValidationError) as error:
+            self.fields('/api/recipes/?fields=id,password')
+        self.assertIn('password', str(error.exception.detail['fields']))
+
+    def test_writes_ignore_params(self):
+        self.assertIsNone(self.fields('/api/recipes/?fields=id', 'post'))
+
+
+class RecipeFieldsetTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='secret',
+            first_name='Пётр', last_name='Петров',
+        )
+        self.recipe = Recipe.objects.create(
+            author=author, name='Суп', text='Сварить', cooking_time=10,
+            image='recipes/images/soup.png',
+        )
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, amount=300,
+            ingredient=Ingredient.objects.create(
+                name='Картофель', measurement_unit='г'
+            ),
+        )
+        self.client = APIClient()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_list_returns_requested_fields(self):
+        results = self.get('/api/recipes/?fields=id,name')['results']
+        self.assertEqual(results, [{'id': self.recipe.pk, 'name': 'Суп'}])
+
+    def test_list_without_params_is_full(self):
+        results = self.get('/api/recipes/')['results']
+        self.assertEqual(set(results[0]), set(RECIPE_FIELDS))
+
+    def test_detail_expands_nested_objects(self):
+        recipe = self.get(
+            f'/api/recipes/{self.recipe.pk}/?expand=author,ingredients'
+        )
+        self.assertEqual(
+            set(recipe),
+            set(SHORT_RECIPE_FIELDS) | {'author', 'ingredients'}
+        )
+        self.assertEqual(recipe['author']['username'], 'author')
+        self.assertEqual(recipe['ingredients'][0]['amount'], 300)
+
+    def test_unknown_field_returns_400(self):
+        response = self.client.get('/api/recipes/?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.json())
@@ -0,0 +1,136 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api import shopping_list
+from recipes.models import (
+    Ingredient, Recipe, RecipeIngredient, ShoppingCart, ShoppingListItem
+)
+
+User = get_user_model()
+
+
+class ShoppingListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='secret',
+            first_name='Иван', last_name='Иванов',
+        )
+        self.flour = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+        self.egg = Ingredient.objects.create(
+            name='Яйцо', measurement_unit='шт'
+        )
+        self.milk = Ingredient.objects.create(
+            name='Молоко', measurement_unit='мл'
+        )
+        self.pancakes = self.create_recipe(
+            'Блины', {self.flour: 200, self.egg: 2, self.milk: 500}
+        )
+        self.bread = self.create_recipe('Хлеб', {self.flour: 500})
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, name, composition):
+        recipe = Recipe.objects.create(
+            author=self.user, name=name, text='Приготовить', cooking_time=30,
+            image='recipes/images/placeholder.png',
+        )
+        for ingredient, amount in composition.items():
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+        return recipe
+
+    def items(self, user=None):
+        return dict(ShoppingListItem.objects.filter(
+            user=user or self.user
+        ).values_list('ingredient__name', 'amount'))
+
+    def add(self, recipe):
+        return self.client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+
+    def remove(self, recipe):
+        return self.client.delete(
+            f'/api/recipes/{recipe.pk}/shopping_cart/'
+        )
+
+    def test_cart_changes_apply_deltas(self):
+        self.assertEqual(self.add(self.pancakes).status_code, 201)
+        self.assertEqual(self.add(self.bread).status_code, 201)
+        self.assertEqual(
+            self.items(), {'Мука': 700, 'Яйцо': 2, 'Молоко': 500}
+        )
+        self.assertEqual(self.remove(self.pancakes).status_code, 204)
+        self.assertEqual(self.items(), {'Мука': 500})
+        self.assertEqual(self.remove(self.bread).status_code, 204)
+        self.assertEqual(self.items(), {})
+
+    def test_repeated_remove_subtracts_once(self):
+        self.add(self.pancakes)
+        self.add(self.bread)
+        self.assertEqual(self.remove(self.bread).status_code, 204)
+        self.assertEqual(self.remove(self.bread).status_code, 400)
+        self.assertEqual(
+            self.items(), {'Мука': 200, 'Яйцо': 2, 'Молоко': 500}
+        )
+
+    def test_recipe_update_changes_carts(self):
+        other = User.objects.create_user(
+            username='guest', email='guest@example.com', password='secret',
+            first_name='Пётр', last_name='Петров',
+        )
+        self.add(self.pancakes)
+        ShoppingCart.objects.create(user=other, recipe=self.pancakes)
+        shopping_list.add_recipe(other, self.pancakes)
+        response = self.client.patch(
+            f'/api/recipes/{self.pancakes.pk}/',
+            {'ingredients': [
+                {'id': self.flour.pk, 'amount': 250},
+                {'id': self.egg.pk, 'amount': 3},
+            ]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.items(), {'Мука': 250, 'Яйцо': 3})
+        self.assertEqual(self.items(other), {'Мука': 250, 'Яйцо': 3})
+
+    def test_failed_delta_keeps_previous_composition(self):
+        self.add(self.pancakes)
+        with mock.patch.object(
+            shopping_list, 'apply_delta', side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.client.patch(
+                    f'/api/recipes/{self.pancakes.pk}/',
+                    {'ingredients': [{'id': self.flour.pk, 'amount': 1}]},
+                    format='json',
+                )
+        composition = dict(self.pancakes.ingredient_amounts.values_list(
+            'ingredient__name', 'amount'
+        ))
+        self.assertEqual(
+            composition, {'Мука': 200, 'Яйцо': 2, 'Молоко': 500}
+        )
+        self.assertEqual(
+            self.items(), {'Мука': 200, 'Яйцо': 2, 'Молоко': 500}
+        )
+
+    def test_rebuild_matches_incremental_aggregate(self):
+        self.add(self.pancakes)
+        self.add(self.bread)
+        incremental = self.items()
+        shopping_list.rebuild(self.user)
+        self.assertEqual(self.items(), incremental)
+
+    def test_download_reads_aggregate(self):
+        self.add(self.pancakes)
+        self.add(self.bread)
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('Мука (г) — 700', body)
+        self.assertIn('Яйцо (шт) — 2', body)
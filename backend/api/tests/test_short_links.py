@@ -0,0 +1,129 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from api import short_links
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class CodeTests(TestCase):
+    def test_round_trip(self):
+        for recipe_id in (1, 61, 62, 12345, 2 ** 63):
+            code = short_links.encode(recipe_id)
+            self.assertEqual(short_links.decode(code), recipe_id)
+
+    def test_foreign_codes_are_rejected(self):
+        self.assertIsNone(short_links.decode(''))
+        self.assertIsNone(short_links.decode('abc-'))
+        self.assertIsNone(short_links.decode(short_links.ALPHABET[0] + 'a'))
+        self.assertIsNone(short_links.decode('a' * 12))
+
+
+class RecipeIdsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com', password='secret',
+            first_name='Пётр', last_name='Петров',
+        )
+        self.recipe = self.create_recipe()
+        self.ids = short_links.RecipeIds()
+
+    def create_recipe(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Recipe.objects.create(
+                author=self.author, name='Суп', text='Сварить',
+                cooking_time=10, image='recipes/images/soup.png',
+            )
+
+    def delete_recipe(self, recipe):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+
+    def test_changes_flip_single_bits(self):
+        self.assertIn(self.recipe.pk, self.ids)
+        with mock.patch.object(self.ids, 'build') as build:
+            created = self.create_recipe()
+            self.assertIn(created.pk, self.ids)
+            deleted = self.recipe.pk
+            self.delete_recipe(self.recipe)
+            self.assertNotIn(deleted, self.ids)
+            self.assertIn(created.pk, self.ids)
+        build.assert_not_called()
+
+    def test_bitmap_grows_for_new_ids(self):
+        self.assertIn(self.recipe.pk, self.ids)
+        with mock.patch.object(self.ids, 'build') as build:
+            self.ids.set(self.recipe.pk + 100, True)
+            self.ids.set(self.recipe.pk + 200, False)
+        build.assert_not_called()
+        self.assertIn(self.recipe.pk + 100, self.ids)
+        self.assertNotIn(self.recipe.pk + 200, self.ids)
+        self.assertNotIn(0, self.ids)
+
+    def test_lost_events_trigger_rebuild(self):
+        self.assertIn(self.recipe.pk, self.ids)
+        created = self.create_recipe()
+        cache.delete(short_links.EVENT_KEY.format(
+            cache.get(short_links.VERSION_KEY)
+        ))
+        with mock.patch.object(
+            self.ids, 'build', wraps=self.ids.build
+        ) as build:
+            self.assertIn(created.pk, self.ids)
+        build.assert_called_once()
+
+    def test_cleared_cache_triggers_rebuild(self):
+        self.assertIn(self.recipe.pk, self.ids)
+        cache.clear()
+        deleted = self.recipe.pk
+        with mock.patch.object(
+            self.ids, 'build', wraps=self.ids.build
+        ) as build:
+            self.delete_recipe(self.recipe)
+            self.assertNotIn(deleted, self.ids)
+        build.assert_called_once()
+
+    @override_settings(SHORT_LINK_INDEX_TTL=0)
+    def test_ttl_expiry_triggers_rebuild(self):
+        self.assertIn(self.recipe.pk, self.ids)
+        Recipe.objects.filter(pk=self.recipe.pk).delete()
+        self.assertNotIn(self.recipe.pk, self.ids)
+
+
+class RedirectTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='secret',
+            first_name='Пётр', last_name='Петров',
+        )
+        self.recipe = Recipe.objects.create(
+            author=author, name='Суп', text='Сварить', cooking_time=10,
+            image='recipes/images/soup.png',
+        )
+
+    def test_existing_recipe_redirects(self):
+        code = short_links.encode(self.recipe.pk)
+        response = self.client.get(f'/s/{code}/')
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(
+            response['Location'].endswith(f'/recipes/{self.recipe.pk}')
+        )
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_unknown_codes_return_404(self):
+        missing = short_links.encode(self.recipe.pk + 1)
+        self.assertEqual(self.client.get(f'/s/{missing}/').status_code, 404)
+        self.assertEqual(self.client.get('/s/abc-/').status_code, 404)
+
+    def test_link_view_returns_code(self):
+        response = self.client.get(f'/api/recipes/{self.recipe.pk}/get-link/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['short-link'].endswith(
+            '/s/' + short_links.encode(self.recipe.pk)
+        ))
@@ -0,0 +1,64 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from api.utils import PLACEHOLDER_PNG, batched
+from foodgram import storage
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = storage.ContentAddressedStorage(
+            location=directory.name
+        )
+
+    def save(self):
+        return self.storage.save(
+            'recipes/images/upload.PNG', ContentFile(PLACEHOLDER_PNG)
+        )
+
+    def test_same_bytes_share_one_file(self):
+        name = self.save()
+        self.assertTrue(name.startswith('recipes/images/'))
+        self.assertTrue(name.endswith('.png'))
+        self.assertEqual(self.save(), name)
+        self.assertEqual(
+            os.listdir(self.storage.path('recipes/images')),
+            [os.path.basename(name)]
+        )
+
+    def test_repeated_save_refreshes_mtime(self):
+        name = self.save()
+        os.utime(self.storage.path(name), (0, 0))
+        self.save()
+        self.assertFalse(
+            storage.modified_before(self.storage, name, cutoff=1)
+        )
+
+    def test_file_removed_before_utime_is_written_again(self):
+        name = self.save()
+        real_utime = os.utime
+
+        def remove_then_touch(path, *args, **kwargs):
+            os.remove(path)
+            return real_utime(path, *args, **kwargs)
+
+        with mock.patch.object(
+            storage.os, 'utime', side_effect=remove_then_touch
+        ):
+            self.assertEqual(self.save(), name)
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), PLACEHOLDER_PNG)
+
+
+class BatchedTests(SimpleTestCase):
+    def test_splits_with_short_tail(self):
+        self.assertEqual(
+            list(batched(range(5), 2)), [[0, 1], [2, 3], [4]]
+        )
+        self.assertEqual(list(batched([], 3)), [])
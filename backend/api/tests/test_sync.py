@@ -0,0 +1,184 @@
+import base64
+import json
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import sync
+from recipes.models import Change, Favorite, Recipe
+
+User = get_user_model()
+
+
+def make_token(txid, change_id, issued_at=None):
+    raw = json.dumps([txid, change_id, issued_at or int(time.time())])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com', password='secret',
+            first_name='Пётр', last_name='Петров',
+        )
+        self.reader = User.objects.create_user(
+            username='reader', email='reader@example.com', password='secret',
+            first_name='Иван', last_name='Иванов',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def create_recipe(self, name='Суп'):
+        return Recipe.objects.create(
+            author=self.author, name=name, text='Сварить', cooking_time=10,
+            image='recipes/images/soup.png',
+        )
+
+    def head(self):
+        response = self.client.get('/api/sync/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['next']
+
+    def changes(self, since, **params):
+        response = self.client.get('/api/sync/', {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_head_of_empty_log(self):
+        Change.objects.all().delete()
+        self.assertEqual(sync.decode_token(self.head())[0], (0, 0))
+
+    def test_changes_since_token(self):
+        recipe = self.create_recipe()
+        token = self.head()
+        self.assertEqual(self.changes(token)['recipes'], [])
+
+        recipe.name = 'Борщ'
+        recipe.save()
+        other = self.create_recipe('Каша')
+        data = self.changes(token)
+        self.assertFalse(data['has_more'])
+        self.assertEqual(
+            sorted(row['name'] for row in data['recipes']), ['Борщ', 'Каша']
+        )
+
+        other_pk = other.pk
+        other.delete()
+        data = self.changes(data['next'])
+        self.assertEqual(data['recipes'], [])
+        self.assertEqual(data['deleted_recipes'], [other_pk])
+
+    def test_personal_changes_only_for_owner(self):
+        recipe = self.create_recipe()
+        token = self.head()
+        Favorite.objects.create(user=self.reader, recipe=recipe)
+        Favorite.objects.create(user=self.author, recipe=recipe)
+        data = self.changes(token)
+        self.assertEqual(
+            data['favorites'], {'added': [recipe.pk], 'removed': []}
+        )
+
+        Favorite.objects.filter(user=self.reader).delete()
+        data = self.changes(data['next'])
+        self.assertEqual(
+            data['favorites'], {'added': [], 'removed': [recipe.pk]}
+        )
+
+    def test_pages_follow_next_token(self):
+        token = self.head()
+        names = [f'Рецепт {number}' for number in range(3)]
+        for name in names:
+            self.create_recipe(name)
+        seen = []
+        while True:
+            data = self.changes(token, limit=1)
+            seen += [row['name'] for row in data['recipes']]
+            token = data['next']
+            if not data['has_more']:
+                break
+        self.assertEqual(seen, names)
+
+    def test_limit_is_clamped(self):
+        token = self.head()
+        self.create_recipe('Первый')
+        self.create_recipe('Второй')
+        data = self.changes(token, limit=0)
+        self.assertEqual(len(data['recipes']), 1)
+        self.assertTrue(data['has_more'])
+
+    def test_bad_parameters_return_400(self):
+        token = self.head()
+        for params in (
+            {'since': 'garbage'},
+            {'since': base64.urlsafe_b64encode(b'[1]').decode()},
+            {'since': token, 'limit': 'many'},
+        ):
+            response = self.client.get('/api/sync/', params)
+            self.assertEqual(response.status_code, 400)
+
+    @override_settings(SYNC_RETENTION_DAYS=30)
+    def test_old_token_returns_410(self):
+        issued_at = int(time.time()) - 30 * 24 * 3600
+        response = self.client.get(
+            '/api/sync/', {'since': make_token(0, 0, issued_at)}
+        )
+        self.assertEqual(response.status_code, 410)
+
+    def test_cursor_follows_commit_order(self):
+        # Запись с меньшим id закоммичена позже: курсор идёт по txid
+        late = Change.objects.create(
+            kind=Change.RECIPE, object_id=self.create_recipe('Поздний').pk,
+            txid=200,
+        )
+        early = Change.objects.create(
+            kind=Change.RECIPE, object_id=self.create_recipe('Ранний').pk,
+            txid=100,
+        )
+        Change.objects.filter(txid=0).delete()
+        data = self.changes(make_token(0, 0), limit=1)
+        self.assertEqual(data['recipes'][0]['name'], 'Ранний')
+        self.assertEqual(sync.decode_token(data['next'])[0], (100, early.pk))
+        data = self.changes(data['next'], limit=1)
+        self.assertEqual(data['recipes'][0]['name'], 'Поздний')
+        self.assertEqual(sync.decode_token(data['next'])[0], (200, late.pk))
+
+    def test_open_transactions_are_not_skipped(self):
+        # Запись транзакции не старше горизонта ещё не видна, курсор
+        # останавливается перед ней
+        recipe = self.create_recipe()
+        Change.objects.all().delete()
+        done = Change.objects.create(
+            kind=Change.RECIPE, object_id=recipe.pk, txid=100
+        )
+        Change.objects.create(
+            kind=Change.RECIPE, object_id=recipe.pk, txid=150
+        )
+        with mock.patch.object(sync, 'commit_horizon', return_value=150):
+            self.assertEqual(
+                sync.decode_token(self.head())[0], (100, done.pk)
+            )
+            data = self.changes(make_token(100, done.pk))
+        self.assertEqual(data['recipes'], [])
+        self.assertEqual(sync.decode_token(data['next'])[0], (100, done.pk))
+        data = self.changes(make_token(100, done.pk))
+        self.assertEqual(len(data['recipes']), 1)
+
+    @override_settings(SYNC_RETENTION_DAYS=30)
+    def test_prune_removes_only_expired_records(self):
+        old, fresh = self.create_recipe('Старый'), self.create_recipe('Новый')
+        Change.objects.filter(object_id=old.pk).update(
+            created_at=timezone.now() - timedelta(days=31)
+        )
+        call_command('prune_change_log', stdout=mock.Mock())
+        self.assertEqual(
+            list(Change.objects.filter(kind=Change.RECIPE).values_list(
+                'object_id', flat=True
+            )),
+            [fresh.pk]
+        )
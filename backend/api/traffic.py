@@ -0,0 +1,92 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import uuid
+
+from django.conf import settings
+
+from .utils import PLACEHOLDER_PNG
+
+logger = logging.getLogger('api.traffic')
+
+SENSITIVE_FIELDS = {
+    'password', 'current_password', 'new_password', 're_new_password',
+    'token', 'auth_token',
+}
+# Личные данные из регистрации и профиля заменяются стабильными
+# псевдонимами: одинаковые значения остаются одинаковыми, а email — email
+PERSONAL_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+MASK = '***'
+PLACEHOLDER_IMAGE_URI = (
+    'data:image/png;base64,' + base64.b64encode(PLACEHOLDER_PNG).decode()
+)
+
+
+def keyed_digest(value):
+    return hmac.new(
+        settings.SECRET_KEY.encode(), str(value).encode(), hashlib.sha256
+    ).hexdigest()[:12]
+
+
+def identity_alias(user):
+    # Стабильный псевдоним пользователя, по которому нельзя восстановить id
+    if not user or not user.is_authenticated:
+        return None
+    return f'user-{keyed_digest(user.pk)}'
+
+
+def pseudonymize(key, value):
+    if not isinstance(value, str):
+        return MASK
+    alias = f'anon-{keyed_digest(value)}'
+    return f'{alias}@example.com' if key == 'email' else alias
+
+
+def sanitize_field(key, value):
+    if key in SENSITIVE_FIELDS:
+        return MASK
+    if key in PERSONAL_FIELDS:
+        return pseudonymize(key, value)
+    return sanitize(value)
+
+
+def sanitize(value):
+    # Маскирует секреты и личные данные, заменяет загружаемые картинки
+    # заглушкой
+    if isinstance(value, dict):
+        return {
+            key: sanitize_field(key, item) for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [sanitize(item) for item in value]
+    if isinstance(value, str) and value.startswith('data:image'):
+        return PLACEHOLDER_IMAGE_URI
+    return value
+
+
+def sanitize_body(request, raw_body):
+    if not raw_body:
+        return None
+    if request.content_type != 'application/json':
+        return {'content_type': request.content_type, 'omitted': True}
+    try:
+        return sanitize(json.loads(raw_body))
+    except ValueError:
+        return None
+
+
+def record(request, response, raw_body, duration):
+    entry = {
+        'request_id': uuid.uuid4().hex,
+        'title': f'{request.method} {request.path}',
+        'body': sanitize_body(request, raw_body),
+        'method': request.method,
+        'path': request.path,
+        'query': request.META.get('QUERY_STRING', ''),
+        'identity': identity_alias(getattr(request, 'user', None)),
+        'status': response.status_code,
+        'duration_ms': round(duration, 3),
+    }
+    logger.info(json.dumps(entry, ensure_ascii=False))
@@ -7,6 +7,7 @@ from .views import (
     RecipeViewSet,
     RecipeLinkView,
     DownloadShoppingCartView,
+    SyncView,
 )
 
 router = DefaultRouter()
@@ -19,5 +20,6 @@ urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
+    path('sync/', SyncView.as_view(), name='sync'),
     path('recipes/<int:id>/get-link/', RecipeLinkView.as_view(), name='recipe-get-link'),
 ]
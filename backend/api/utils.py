@@ -0,0 +1,29 @@
+import base64
+import math
+
+# Прозрачный PNG 1x1: заглушка для сгенерированных рецептов и для картинок
+# в записанном трафике
+PLACEHOLDER_PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYA'
+    'AjCB0C8AAAAASUVORK5CYII='
+)
+
+
+def percentile(values, percent):
+    # Перцентиль отсортированного списка (метод ближайшего ранга)
+    if not values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def batched(iterable, size):
+    # Списки по size элементов, последний — короче
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
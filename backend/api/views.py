@@ -1,14 +1,22 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import Q
-from django.http import HttpResponse
+from django.http import (
+    FileResponse, Http404, HttpResponseRedirect, StreamingHttpResponse
+)
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_safe
 from django_filters.rest_framework import DjangoFilterBackend
 
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
 from djoser.serializers import SetPasswordSerializer
@@ -19,14 +27,38 @@ from recipes.models import (
     Recipe,
     RecipeFilter,
     ShoppingCart,
+    ShoppingListItem,
+    ShoppingListPDF,
 )
 from users.models import Subscription
 
+from . import (
+    catalog, db_router, deletion, feed, shopping_list, short_links, sync
+)
+from .tasks import (
+    delete_unused_file, delete_user, fan_out_recipe, sync_subscription
+)
+from .fast_serializers import (
+    RECIPE_FIELDS,
+    SUBSCRIPTION_VALUES,
+    recipe_values_fields,
+    serialize_recipes,
+    serialize_subscriptions,
+    serialize_users,
+    user_row,
+    user_values,
+)
+from .fieldsets import requested_fields
 from .pagination import CustomPagination
+from .pantry import pantry_index
+from .similarity import similar_recipes
 from .serializers import (
-    FavoriteSerializer,
     IngredientSerializer,
     RecipeSerializer,
+    SHORT_RECIPE_FIELDS,
+    ShoppingListItemSerializer,
+    ShoppingListPDFSerializer,
+    ShortRecipeSerializer,
     SubscriptionSerializer,
     UserAvatarSerializer,
     UserRegistrationSerializer,
@@ -36,8 +68,31 @@ from .serializers import (
 User = get_user_model()
 
 
+def query_limit(request, default, maximum):
+    # ?limit= в пределах [1, maximum]; нечисловое значение — ValueError
+    limit = int(request.query_params.get('limit', default))
+    return min(max(limit, 1), maximum)
+
+
+# Безопасные запросы читают с реплики, если пользователь недавно ничего
+# не менял
+class ReplicaReadMixin:
+    def dispatch(self, request, *args, **kwargs):
+        token = db_router.read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            db_router.read_alias.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        # Аутентификация и проверка прав уже прошли на основной БД
+        super().initial(request, *args, **kwargs)
+        if request.method in permissions.SAFE_METHODS:
+            db_router.read_alias.set(db_router.choose_replica(request.user))
+
+
 # ViewSet для отображения списка ингредиентов
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = IngredientSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     pagination_class = None
@@ -53,10 +108,70 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
             ).order_by('name')
         return queryset
 
+    # Справочник отдаётся без сериализатора: словари из .values()
+    def list(self, request, *args, **kwargs):
+        if (
+            not request.query_params.get('name')
+            and self.is_plain_json(request)
+        ):
+            # Весь справочник — готовый снимок, клиент перепроверяет его
+            # по ETag
+            return catalog.snapshot_response(
+                request, catalog.catalog.get(), no_cache=True
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(list(queryset.values(*catalog.CATALOG_FIELDS)))
+
+    @staticmethod
+    def is_plain_json(request):
+        return (
+            request.accepted_renderer.format == 'json'
+            and 'indent' not in request.accepted_media_type
+        )
+
+    @action(detail=False, methods=['get'], url_path='catalog')
+    def catalog_version(self, request):
+        # Текущая версия справочника и адрес его неизменяемого снимка
+        version = catalog.catalog.get().version
+        response = Response({
+            'version': version,
+            'url': request.build_absolute_uri(
+                reverse('ingredients-catalog-snapshot', args=[version])
+            ),
+        })
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    @action(
+        detail=False, methods=['get'],
+        url_path=r'catalog/(?P<version>[0-9a-f]+)'
+    )
+    def catalog_snapshot(self, request, version=None):
+        snapshot = catalog.catalog.get()
+        if version != snapshot.version:
+            # Устаревшая версия: отправляем на актуальный снимок
+            response = HttpResponseRedirect(reverse(
+                'ingredients-catalog-snapshot', args=[snapshot.version]
+            ))
+            response['Cache-Control'] = 'no-cache'
+            return response
+        return catalog.snapshot_response(
+            request, snapshot, public=True, max_age=365 * 24 * 3600,
+            immutable=True
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        ingredient = get_object_or_404(
+            self.get_queryset().values(*catalog.CATALOG_FIELDS),
+            pk=kwargs['pk']
+        )
+        return Response(ingredient)
+
 
 # ViewSet для управления пользователями и подписками
-class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+class UserViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
+    # Сортировка по первичному ключу: страницы стабильны и идут по индексу
+    queryset = User.objects.order_by('id')
     serializer_class = UserSerializer
     pagination_class = CustomPagination
 
@@ -70,11 +185,30 @@ class UserViewSet(viewsets.ModelViewSet):
             return [permissions.AllowAny()]
         return [permissions.IsAuthenticated()]
 
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(
+            user_values(self.get_queryset(), request)
+        )
+        return self.get_paginated_response(serialize_users(page, request))
+
+    def retrieve(self, request, *args, **kwargs):
+        user = get_object_or_404(
+            user_values(self.get_queryset(), request), pk=kwargs['pk']
+        )
+        return Response(serialize_users([user], request)[0])
+
+    def perform_destroy(self, instance):
+        # Аккаунт отключается сразу, а рецепты, подписки и файлы удаляются
+        # в фоне порциями
+        if instance != self.request.user and not self.request.user.is_staff:
+            raise PermissionDenied('Нельзя удалить чужой аккаунт.')
+        deletion.disable_user(instance)
+        delete_user.delay(user_id=instance.pk)
+
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def me(self, request):
-        # Получение текущего пользователя
-        serializer = self.get_serializer(request.user)
-        return Response(serializer.data)
+        # Пользователь уже загружен аутентификацией; на себя подписаться нельзя
+        return Response(serialize_users([user_row(request.user)], request)[0])
 
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated], url_path='set_password')
     def set_password(self, request):
@@ -106,24 +240,26 @@ class UserViewSet(viewsets.ModelViewSet):
         user = request.user
         if not user.avatar:
             return Response({'detail': 'Аватар отсутствует.'}, status=status.HTTP_400_BAD_REQUEST)
-        user.avatar.delete(save=False)
+        # Файл удаляется в фоне, ответ не ждёт хранилища
+        name = user.avatar.name
         user.avatar = None
         user.save()
+        delete_unused_file.delay(name=name)
         return Response({'detail': 'Аватар успешно удалён.'}, status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated], url_path='subscriptions')
     def subscriptions(self, request):
         # Получение подписок пользователя
         recipes_limit = request.query_params.get('recipes_limit')
-        subscriptions = Subscription.objects.filter(user=request.user).select_related('author')
+        recipes_limit = int(recipes_limit) if recipes_limit else None
+        subscriptions = Subscription.objects.filter(user=request.user).values(
+            'author_id', **SUBSCRIPTION_VALUES
+        )
         paginator = CustomPagination()
         page = paginator.paginate_queryset(subscriptions, request)
-        serializer = SubscriptionSerializer(
-            page,
-            many=True,
-            context={'request': request, 'recipes_limit': recipes_limit}
+        return paginator.get_paginated_response(
+            serialize_subscriptions(page, request, recipes_limit)
         )
-        return paginator.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def subscribe(self, request, pk=None):
@@ -134,6 +270,8 @@ class UserViewSet(viewsets.ModelViewSet):
         if Subscription.objects.filter(user=user, author=author).exists():
             return Response({'errors': 'Вы уже подписаны'}, status=status.HTTP_400_BAD_REQUEST)
         subscription = Subscription.objects.create(user=user, author=author)
+        # Счётчик подписчиков и лента обновляются в фоне
+        sync_subscription.delay(user_id=user.pk, author_id=author.pk)
         serializer = SubscriptionSerializer(subscription, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -145,11 +283,12 @@ class UserViewSet(viewsets.ModelViewSet):
         if not subscription.exists():
             return Response({'errors': 'Вы не подписаны'}, status=status.HTTP_400_BAD_REQUEST)
         subscription.delete()
+        sync_subscription.delay(user_id=user.pk, author_id=author.pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 # ViewSet для управления рецептами, избранным и корзиной
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -172,10 +311,126 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if author_id:
             queryset = queryset.filter(author__id=author_id)
 
+        # Рейтинговые ленты читаются по индексу таблицы RecipePopularity;
+        # рецепты без единого события в них не попадают
+        ordering = self.request.query_params.get('ordering')
+        if ordering in ('popular', 'trending'):
+            queryset = queryset.filter(popularity__isnull=False).order_by(
+                f'-popularity__{ordering}_score', '-pub_date'
+            )
+
         return queryset
 
+    # Чтение идёт мимо ModelSerializer: ответ собирается из .values(),
+    # связанные данные догружаются одним запросом на страницу
+    def list(self, request, *args, **kwargs):
+        fields = self.get_requested_fields()
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(
+            queryset.values(*recipe_values_fields(fields))
+        )
+        return self.get_paginated_response(
+            serialize_recipes(page, request, fields)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        fields = self.get_requested_fields()
+        queryset = self.filter_queryset(self.get_queryset())
+        recipe = get_object_or_404(
+            queryset.values(*recipe_values_fields(fields)), pk=kwargs['pk']
+        )
+        return Response(serialize_recipes([recipe], request, fields)[0])
+
+    def get_requested_fields(self):
+        return requested_fields(
+            self.request, SHORT_RECIPE_FIELDS, RECIPE_FIELDS
+        )
+
+    def serialize_ids(self, recipe_ids):
+        # Рецепты по списку id в том же порядке, удалённые пропускаются
+        fields = self.get_requested_fields()
+        rows = Recipe.objects.filter(pk__in=recipe_ids).values(
+            *recipe_values_fields(fields)
+        )
+        recipes = {row['id']: row for row in rows}
+        return serialize_recipes(
+            [recipes[pk] for pk in recipe_ids if pk in recipes],
+            self.request, fields
+        )
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        fan_out_recipe.delay(recipe_id=recipe.pk)
+
+    @action(
+        detail=False, methods=['get'],
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def feed(self, request):
+        # Лента рецептов авторов, на которых подписан пользователь
+        try:
+            limit = query_limit(request, 10, 100)
+            cursor = request.query_params.get('cursor')
+            cursor = feed.decode_cursor(cursor) if cursor else None
+        except ValueError:
+            return Response(
+                {'errors': 'Некорректные параметры'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        recipe_ids, next_cursor = feed.get_feed(request.user, cursor, limit)
+        results = self.serialize_ids(recipe_ids)
+        next_url = None
+        if next_cursor:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'cursor', next_cursor
+            )
+        return Response({'next': next_url, 'results': results})
+
+    @action(detail=False, methods=['get'])
+    def pantry(self, request):
+        # Рецепты, которые можно приготовить из имеющихся продуктов
+        try:
+            pantry = {
+                int(item) for item in
+                request.query_params.get('ingredients', '').split(',') if item
+            }
+            limit = query_limit(request, 10, 100)
+            max_missing = request.query_params.get('max_missing')
+            max_missing = int(max_missing) if max_missing else None
+        except ValueError:
+            return Response(
+                {'errors': 'Ожидаются целые числа'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        scores = pantry_index.score(pantry, limit, max_missing)
+        scores = {
+            recipe_id: (coverage, missing)
+            for recipe_id, coverage, missing in scores
+        }
+        results = self.serialize_ids(list(scores))
+        for recipe in results:
+            coverage, missing = scores[recipe['id']]
+            recipe['coverage'] = round(coverage, 4)
+            recipe['missing'] = missing
+        return Response(results)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        # Рецепты с близким составом по индексу MinHash/LSH
+        recipe = get_object_or_404(Recipe, pk=pk)
+        try:
+            limit = query_limit(request, 10, 50)
+        except ValueError:
+            return Response(
+                {'errors': 'Ожидается целое число'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        scores = similar_recipes(recipe.pk, limit)
+        scores = dict(scores)
+        results = self.serialize_ids(list(scores))
+        for recipe in results:
+            recipe['similarity'] = round(scores[recipe['id']], 4)
+        return Response(results)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def favorite(self, request, pk=None):
@@ -183,8 +438,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
         user = request.user
         if Favorite.objects.filter(user=user, recipe=recipe).exists():
             return Response({'errors': 'Уже в избранном'}, status=status.HTTP_400_BAD_REQUEST)
-        favorite = Favorite.objects.create(user=user, recipe=recipe)
-        serializer = FavoriteSerializer(favorite)
+        Favorite.objects.create(user=user, recipe=recipe)
+        serializer = ShortRecipeSerializer(
+            recipe, context={'request': request}
+        )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @favorite.mapping.delete
@@ -211,53 +468,176 @@ class RecipeViewSet(viewsets.ModelViewSet):
         recipe = get_object_or_404(Recipe, pk=pk)
         if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
             return Response({'errors': 'Рецепт уже в корзине.'}, status=status.HTTP_400_BAD_REQUEST)
-        ShoppingCart.objects.create(user=user, recipe=recipe)
-        serializer = RecipeSerializer(recipe, context={'request': request})
+        with transaction.atomic():
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+            shopping_list.add_recipe(user, recipe)
+        serializer = ShortRecipeSerializer(
+            recipe, context={'request': request}
+        )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @shopping_cart.mapping.delete
     def remove_from_cart(self, request, pk=None):
         user = request.user
         recipe = get_object_or_404(Recipe, pk=pk)
-        cart_item = ShoppingCart.objects.filter(user=user, recipe=recipe)
-        if cart_item.exists():
-            cart_item.delete()
+        with transaction.atomic():
+            # Вычитаем из списка покупок, только если строку удалил именно
+            # этот запрос
+            deleted, _ = ShoppingCart.objects.filter(
+                user=user, recipe=recipe
+            ).delete()
+            if deleted:
+                shopping_list.remove_recipe(user, recipe)
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response({'errors': 'Рецепта нет в корзине.'}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(
+        detail=False, methods=['get'],
+        permission_classes=[permissions.IsAuthenticated],
+        url_path='shopping_cart/summary'
+    )
+    def shopping_cart_summary(self, request):
+        # Сводка по корзине из предрасчитанного списка покупок
+        items = ShoppingListItem.objects.filter(
+            user=request.user
+        ).select_related('ingredient').order_by('ingredient__name')
+        serializer = ShoppingListItemSerializer(items, many=True)
+        return Response(serializer.data)
+
+    @action(
+        detail=False, methods=['post'],
+        permission_classes=[permissions.IsAuthenticated],
+        url_path='download_shopping_cart/pdf'
+    )
+    def shopping_list_pdf(self, request):
+        # Ставит рендеринг PDF в очередь; для неизменной корзины файл
+        # уже готов
+        job = shopping_list.request_pdf(request.user)
+        serializer = ShoppingListPDFSerializer(
+            job, context={'request': request}
+        )
+        if job.status == ShoppingListPDF.DONE:
+            return Response(serializer.data)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(
+        detail=False, methods=['get'],
+        permission_classes=[permissions.IsAuthenticated],
+        url_path=r'download_shopping_cart/pdf/(?P<job_id>\d+)'
+    )
+    def shopping_list_pdf_status(self, request, job_id=None):
+        job = get_object_or_404(
+            ShoppingListPDF, pk=job_id, user=request.user
+        )
+        serializer = ShoppingListPDFSerializer(
+            job, context={'request': request}
+        )
+        return Response(serializer.data)
+
+    @action(
+        detail=False, methods=['get'],
+        permission_classes=[permissions.IsAuthenticated],
+        url_path=r'download_shopping_cart/pdf/(?P<job_id>\d+)/file'
+    )
+    def shopping_list_pdf_file(self, request, job_id=None):
+        job = get_object_or_404(
+            ShoppingListPDF, pk=job_id, user=request.user,
+            status=ShoppingListPDF.DONE
+        )
+        if not job.file:
+            raise Http404
+        return FileResponse(
+            job.file.open('rb'), as_attachment=True,
+            filename='shopping_list.pdf', content_type='application/pdf'
+        )
+
 
 # Отдаёт короткую ссылку на рецепт
 class RecipeLinkView(APIView):
     def get(self, request, id, format=None):
-        recipe = get_object_or_404(Recipe, id=id)
-        short_link = f"{settings.BASE_URL}/recipes/{recipe.id}"
+        # Битовая карта процесса может ещё не знать о только что созданном
+        # рецепте; запросов здесь мало, поэтому при промахе проверяем БД
+        if (
+            id not in short_links.recipe_ids
+            and not Recipe.objects.filter(pk=id).exists()
+        ):
+            raise Http404
+        short_link = f"{settings.BASE_URL}/s/{short_links.encode(id)}"
         return Response({"short-link": short_link}, status=status.HTTP_200_OK)
 
 
+# Переход по короткой ссылке: код декодируется в id без обращения к БД
+@require_safe
+def short_link_redirect(request, code):
+    recipe_id = short_links.decode(code)
+    if recipe_id is None or recipe_id not in short_links.recipe_ids:
+        raise Http404
+    response = HttpResponseRedirect(f"{settings.BASE_URL}/recipes/{recipe_id}")
+    patch_cache_control(
+        response, public=True, max_age=settings.SHORT_LINK_CACHE_TIMEOUT
+    )
+    return response
+
+
+# Изменения после токена since: рецепты, авторы, ингредиенты и личные
+# избранное/корзина/подписки вызывающего, удалённое — списками id
+class SyncView(APIView):
+    default_limit = 500
+    max_limit = 1000
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        if not since:
+            # Без токена отдаётся только текущая позиция журнала
+            return Response({'next': sync.head_token()})
+        try:
+            since, issued_at = sync.decode_token(since)
+            limit = query_limit(request, self.default_limit, self.max_limit)
+        except ValueError:
+            return Response(
+                {'errors': 'Некорректные параметры'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            return Response(
+                sync.get_changes(request, since, issued_at, limit)
+            )
+        except sync.TokenExpired:
+            return Response(
+                {'errors': 'Токен устарел, нужна полная загрузка'},
+                status=status.HTTP_410_GONE
+            )
+
+
 # Скачивание списка покупок в формате TXT
 class DownloadShoppingCartView(APIView):
     permission_classes = [IsAuthenticated]
+    lines_per_chunk = 500
 
     def get(self, request):
         user = request.user
-        shopping_cart = ShoppingCart.objects.filter(user=user)
-        ingredients = {}
-
-        # Подсчёт общего количества ингредиентов из всех рецептов в корзине
-        for item in shopping_cart:
-            for recipe_ingredient in item.recipe.ingredient_amounts.all():
-                name = recipe_ingredient.ingredient.name
-                amount = recipe_ingredient.amount
-                unit = recipe_ingredient.ingredient.measurement_unit
-                key = (name, unit)
-                ingredients[key] = ingredients.get(key, 0) + amount
-
-        sorted_ingredients = sorted(ingredients.items(), key=lambda x: x[0][0])
-
-        txt_content = f"Список покупок для {user.username}\n\n"
-        for (name, unit), amount in sorted_ingredients:
-            txt_content += f"{name} ({unit}) — {amount}\n"
+        # Суммы по ингредиентам поддерживаются при каждом изменении корзины
+        items = ShoppingListItem.objects.filter(user=user).order_by(
+            'ingredient__name', 'ingredient__measurement_unit'
+        ).values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        )
 
-        response = HttpResponse(txt_content, content_type='text/plain; charset=utf-8')
+        response = StreamingHttpResponse(
+            self.render_lines(user, items.iterator()),
+            content_type='text/plain; charset=utf-8'
+        )
         response['Content-Disposition'] = 'attachment; filename="shopping_list.txt"'
         return response
+
+    def render_lines(self, user, items):
+        # Отдаём список частями, не собирая его целиком в памяти
+        chunk = [f"Список покупок для {user.username}\n\n"]
+        for name, unit, amount in items:
+            chunk.append(f"{name} ({unit}) — {amount}\n")
+            if len(chunk) >= self.lines_per_chunk:
+                yield ''.join(chunk).encode()
+                chunk = []
+        if chunk:
+            yield ''.join(chunk).encode()
@@ -0,0 +1,10 @@
+import os
+from logging.handlers import RotatingFileHandler
+
+
+# Каталог журнала создаётся при первой записи, а не при импорте настроек:
+# с delay=True файл открывается только когда в него действительно пишут
+class LazyRotatingFileHandler(RotatingFileHandler):
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
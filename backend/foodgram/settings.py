@@ -41,11 +41,13 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'django_filters',
     'recipes',
     'users',
+    'tasks',
     'api',
     'djoser',
     'corsheaders',
@@ -53,6 +55,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -60,6 +63,9 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'api.middleware.SlowQueryMiddleware',
+    'api.middleware.TrafficCaptureMiddleware',
+    'api.middleware.ReplicaPinMiddleware',
 ]
 
 REST_FRAMEWORK = {
@@ -69,6 +75,18 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # JSON кодируется orjson; MessagePack — по Accept: application/msgpack
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.ORJSONParser',
+        'api.renderers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 DJOSER = {
@@ -117,6 +135,39 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения: DB_REPLICA_HOSTS=host1,host2:5433, остальные параметры
+# подключения как у default. В тестах реплики смотрят в тестовую default
+DATABASE_REPLICAS = []
+for number, address in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = address.strip().partition(':')
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+# На SQLite (локальный запуск и тесты) реплику изображает второе подключение
+# к той же базе. Чтения на неё идут, только если она есть в DATABASE_REPLICAS
+if DATABASES['default']['ENGINE'].endswith('sqlite3') and not DATABASE_REPLICAS:
+    DATABASES['replica_1'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+# Сколько секунд после записи пользователь читает с основной БД
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+
+# Кэш, общий для всех процессов gunicorn и воркера: закрепление за основной
+# БД, версии индексов и справочников. Без REDIS_URL — кэш в памяти процесса,
+# пригодный только для разработки в один процесс
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -162,6 +213,16 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Картинки рецептов и аватары хранятся под хэшем содержимого
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'images': {'BACKEND': 'foodgram.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+# Файл картинки моложе стольких секунд не удаляется: его может разделять
+# загрузка, запись о которой ещё не закоммичена (delete_unused_file, gc_media)
+MEDIA_DELETE_MIN_AGE = int(os.getenv('MEDIA_DELETE_MIN_AGE', 3600))
+
 USE_X_FORWARDED_HOST = True
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
@@ -176,3 +237,127 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 BASE_URL = 'http://localhost'
+
+# Короткие ссылки /s/<код>: соль перемешивает алфавит base62 (смена соли
+# делает выданные ссылки недействительными), битовая карта id рецептов
+# правится по одному биту при создании/удалении рецепта и пересобирается
+# целиком раз в TTL секунд
+SHORT_LINK_SALT = os.getenv('SHORT_LINK_SALT', 'foodgram')
+SHORT_LINK_INDEX_TTL = int(os.getenv('SHORT_LINK_INDEX_TTL', 300))
+SHORT_LINK_CACHE_TIMEOUT = int(os.getenv('SHORT_LINK_CACHE_TIMEOUT', 3600))
+
+# Журнал медленных SQL-запросов с планами EXPLAIN (по умолчанию выключен)
+SLOW_QUERY_LOG_ENABLED = os.getenv('SLOW_QUERY_LOG_ENABLED', '0') == '1'
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0.1))
+SLOW_QUERY_LOG_FILE = os.getenv('SLOW_QUERY_LOG_FILE', os.path.join(BASE_DIR, 'logs', 'slow_queries.jsonl'))
+
+# Запись реального трафика API в JSONL (по умолчанию выключена)
+TRAFFIC_CAPTURE_ENABLED = os.getenv('TRAFFIC_CAPTURE_ENABLED', '0') == '1'
+TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv('TRAFFIC_CAPTURE_SAMPLE_RATE', 0.01))
+TRAFFIC_CAPTURE_MAX_BODY = 1024 * 1024
+TRAFFIC_CAPTURE_FILE = os.getenv('TRAFFIC_CAPTURE_FILE', os.path.join(BASE_DIR, 'logs', 'requests.jsonl'))
+
+# Индекс составов рецептов для подбора по продуктам: файл собирает воркер
+# (или build_pantry_index) не чаще раза в PANTRY_INDEX_MIN_AGE секунд,
+# процессы API перечитывают его при замене
+PANTRY_INDEX_FILE = os.getenv(
+    'PANTRY_INDEX_FILE', os.path.join(BASE_DIR, 'var', 'pantry_index.npz')
+)
+PANTRY_INDEX_MIN_AGE = int(os.getenv('PANTRY_INDEX_MIN_AGE', 30))
+
+# Снимок справочника ингредиентов пересобирается по сигналу об изменении
+# и не реже чем раз в CATALOG_SNAPSHOT_TTL секунд
+CATALOG_SNAPSHOT_TTL = int(os.getenv('CATALOG_SNAPSHOT_TTL', 300))
+
+# Рейтинги рецептов: веса событий и период полураспада для trending
+RANKING_FAVORITE_WEIGHT = 1.0
+RANKING_CART_WEIGHT = 0.5
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 48))
+# update_recipe_rankings не трогает события моложе стольких секунд: их
+# транзакции могут быть ещё не закоммичены
+RANKING_SAFETY_LAG = int(os.getenv('RANKING_SAFETY_LAG', 60))
+
+# Лента подписок: длина материализованной ленты и порог «тяжёлого» автора,
+# рецепты которого не рассылаются подписчикам, а подмешиваются при чтении
+FEED_TIMELINE_SIZE = int(os.getenv('FEED_TIMELINE_SIZE', 500))
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 1000))
+
+# Сжатие ответов: тела меньше порога не сжимаются, общие для всех сжатые
+# тела до COMPRESSION_CACHE_MAX_SIZE байт кэшируются по хэшу содержимого
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_CACHE_MAX_SIZE = int(os.getenv('COMPRESSION_CACHE_MAX_SIZE', 1024 * 1024))
+COMPRESSION_CACHE_TIMEOUT = int(os.getenv('COMPRESSION_CACHE_TIMEOUT', 3600))
+
+# Рендеринг PDF списка покупок в пуле процессов; задание, не завершённое
+# за PDF_RENDER_TIMEOUT секунд, ставится заново
+PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', 2))
+PDF_RENDER_TIMEOUT = int(os.getenv('PDF_RENDER_TIMEOUT', 120))
+# Шрифт с кириллицей (пакет fonts-dejavu-core)
+PDF_FONT_PATH = os.getenv('PDF_FONT_PATH', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
+# Очередь отложенных задач в таблице БД (воркер: manage.py run_worker).
+# TASKS_EAGER=1 выполняет задачи сразу в вызывающем коде — для тестов
+TASKS_EAGER = os.getenv('TASKS_EAGER', '0') == '1'
+# Задача, которая выполняется дольше (секунды), считается брошенной
+TASKS_LOCK_TIMEOUT = int(os.getenv('TASKS_LOCK_TIMEOUT', 600))
+
+# Фоновое удаление пользователей и рецептов: строк в одной транзакции
+# и секунд работы одной задачи (остаток ставится новой задачей)
+DELETION_BATCH_SIZE = int(os.getenv('DELETION_BATCH_SIZE', 1000))
+DELETION_TASK_BUDGET = int(os.getenv('DELETION_TASK_BUDGET', 30))
+
+# Журнал изменений для /api/sync/: записи старше срока хранения (дни)
+# чистит prune_change_log, клиенту с таким старым токеном нужна полная
+# загрузка
+SYNC_RETENTION_DAYS = int(os.getenv('SYNC_RETENTION_DAYS', 30))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'raw': {'format': '%(message)s'},
+        'verbose': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'verbose',
+        },
+        'slow_queries': {
+            'class': 'foodgram.log_handlers.LazyRotatingFileHandler',
+            'filename': SLOW_QUERY_LOG_FILE,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'raw',
+        },
+        'traffic': {
+            'class': 'foodgram.log_handlers.LazyRotatingFileHandler',
+            'filename': TRAFFIC_CAPTURE_FILE,
+            'maxBytes': 50 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'raw',
+        },
+    },
+    'loggers': {
+        'api.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'api.traffic': {
+            'handlers': ['traffic'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'tasks': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,48 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files.storage import FileSystemStorage, storages
+
+
+# Хранилище картинок, где имя файла — хэш содержимого: одинаковые загрузки
+# ложатся в один файл. Файл может принадлежать нескольким записям, поэтому
+# удалять его можно только после проверки ссылок (delete_unused_file, gc_media)
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        digest = hashlib.blake2b(digest_size=16)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        extension = posixpath.splitext(name)[1].lower()
+        name = posixpath.join(
+            posixpath.dirname(name), digest.hexdigest() + extension
+        )
+        if self.exists(name):
+            # Свежее время изменения защищает файл от gc_media, пока новая
+            # ссылка на него ещё не закоммичена
+            try:
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                # gc_media удалил файл между проверкой и utime: пишем заново
+                pass
+        return super().save(name, content, max_length)
+
+
+def modified_before(storage, name, cutoff):
+    # Файл не трогали с момента cutoff (time.time()). Повторная загрузка
+    # тех же байтов обновляет время изменения, пока её запись ещё
+    # не закоммичена
+    try:
+        return os.stat(storage.path(name)).st_mtime < cutoff
+    except FileNotFoundError:
+        return False
+
+
+def image_storage():
+    # Вызываемый объект: миграции хранят ссылку на функцию, а не настройки
+    # хранилища
+    return storages['images']
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_shoppinglistitem'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListPDF',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cart_hash', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=16)),
+                ('file', models.FileField(blank=True, upload_to='shopping_lists/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_pdfs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'PDF списка покупок',
+                'verbose_name_plural': 'PDF списков покупок',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'cart_hash'], name='shoppinglistpdf_hash_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:54
+
+import foodgram.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_shoppinglistpdf'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(storage=foodgram.storage.image_storage, upload_to='recipes/images/'),
+        ),
+    ]
@@ -1,16 +1,31 @@
-from django.db import models
+from django.db import connections, models
+from django.db.models import Count, Exists, F, OuterRef, Q
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, SearchVectorField
+)
 from django.core.validators import MinValueValidator
 import django_filters
 from django_filters import rest_framework as filters
 
+from foodgram.storage import image_storage
+
 User = get_user_model()
 
+SEARCH_CONFIG = 'russian'
+# Название важнее описания: вес A против B
+RECIPE_SEARCH_VECTOR = (
+    SearchVector('name', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+)
+
 
 class Ingredient(models.Model):
     """Модель ингредиента с названием и единицей измерения."""
     name = models.CharField(max_length=200)
     measurement_unit = models.CharField(max_length=200)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['name']
@@ -22,6 +37,12 @@ class Ingredient(models.Model):
         return f"{self.name} ({self.measurement_unit})"
 
 
+# Рецепты, скрытые до фонового удаления, не видны в выдаче
+class RecipeManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class Recipe(models.Model):
     """Модель рецепта с автором, списком ингредиентов и описанием."""
     author = models.ForeignKey(
@@ -30,7 +51,9 @@ class Recipe(models.Model):
         related_name='recipes'
     )
     name = models.CharField(max_length=200)
-    image = models.ImageField(upload_to='recipes/images/')
+    image = models.ImageField(
+        upload_to='recipes/images/', storage=image_storage
+    )
     text = models.TextField()
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -40,15 +63,41 @@ class Recipe(models.Model):
         validators=[MinValueValidator(1)]
     )
     pub_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Рецепт удалён в админке, строки ещё убирает фоновая задача
+    is_deleted = models.BooleanField(default=False, editable=False)
+
+    objects = RecipeManager()
+    # Все рецепты, включая скрытые: для удаления и проверки ссылок на файлы
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            GinIndex(
+                fields=['search_vector'], name='recipe_search_vector_idx'
+            ),
+            # Рецепты популярных авторов в ленте читаются по ключу
+            # (pub_date, id) без сортировки всех рецептов автора
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_timeline_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Поисковый вектор пересчитывается в БД после каждого сохранения
+        recipes = Recipe.objects.filter(pk=self.pk)
+        if connections[recipes.db].vendor == 'postgresql':
+            recipes.update(search_vector=RECIPE_SEARCH_VECTOR)
+
 
 class RecipeIngredient(models.Model):
     """Связующая модель между рецептом и ингредиентом с количеством."""
@@ -66,6 +115,83 @@ class RecipeIngredient(models.Model):
         verbose_name = 'Ингредиент в рецепте'
         verbose_name_plural = 'Ингредиенты в рецептах'
         unique_together = ('recipe', 'ingredient')
+        indexes = [
+            # Обратный индекс «ингредиент -> рецепты» для фильтров по составу
+            models.Index(
+                fields=['ingredient', 'recipe'],
+                name='recipeingredient_posting_idx'
+            ),
+        ]
+
+
+class RecipeLSHBucket(models.Model):
+    """Корзина LSH: рецепты, у которых совпала полоса MinHash-подписи."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='lsh_buckets'
+    )
+    key = models.BigIntegerField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'Корзины LSH'
+        unique_together = ('recipe', 'key')
+
+
+class RecipePopularity(models.Model):
+    """Предрасчитанные рейтинги рецепта для лент popular и trending."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='popularity'
+    )
+    popular_score = models.FloatField(default=0)
+    # Логарифм суммы экспоненциально затухающих весов событий
+    trending_score = models.FloatField(default=0)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+        indexes = [
+            models.Index(fields=['-popular_score'], name='recipe_popular_idx'),
+            models.Index(
+                fields=['-trending_score'], name='recipe_trending_idx'
+            ),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        unique_together = ('user', 'recipe')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feedentry_timeline_idx'
+            ),
+        ]
 
 
 class Favorite(models.Model):
@@ -80,6 +206,7 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         related_name='favorited_by'
     )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         unique_together = ('user', 'recipe')
@@ -90,13 +217,23 @@ class Favorite(models.Model):
         return f"{self.user} добавил {self.recipe} в избранное"
 
 
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    """Список чисел через запятую: ?ingredients=1,2,3."""
+
+
 class RecipeFilter(django_filters.FilterSet):
-    """Фильтр для рецептов по наличию в списке покупок."""
+    """Фильтр рецептов по списку покупок и составу, полнотекстовый поиск."""
     is_in_shopping_cart = filters.BooleanFilter(method='filter_shopping_cart')
+    search = filters.CharFilter(method='filter_search')
+    ingredients = NumberInFilter(method='filter_ingredients')
+    exclude_ingredients = NumberInFilter(method='filter_exclude_ingredients')
 
     class Meta:
         model = Recipe
-        fields = ['is_in_shopping_cart']
+        fields = [
+            'is_in_shopping_cart', 'search',
+            'ingredients', 'exclude_ingredients',
+        ]
 
     def filter_shopping_cart(self, queryset, name, value):
         user = self.request.user
@@ -104,6 +241,38 @@ class RecipeFilter(django_filters.FilterSet):
             return queryset.filter(shopping_cart__user=user)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        if connections[queryset.db].vendor != 'postgresql':
+            return queryset.filter(
+                Q(name__icontains=value) | Q(text__icontains=value)
+            )
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-pub_date')
+
+    def filter_ingredients(self, queryset, name, value):
+        # Рецепты, содержащие все указанные ингредиенты: группировка по рецепту
+        ids = {int(item) for item in value}
+        if not ids:
+            return queryset
+        matching = RecipeIngredient.objects.filter(
+            ingredient_id__in=ids
+        ).values('recipe_id').annotate(
+            matched=Count('ingredient_id')
+        ).filter(matched=len(ids)).values('recipe_id')
+        return queryset.filter(pk__in=matching)
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        ids = {int(item) for item in value}
+        if not ids:
+            return queryset
+        return queryset.filter(~Exists(RecipeIngredient.objects.filter(
+            recipe_id=OuterRef('pk'), ingredient_id__in=ids
+        )))
+
 
 class ShoppingCart(models.Model):
     """Модель списка покупок пользователя."""
@@ -113,6 +282,99 @@ class ShoppingCart(models.Model):
         related_name='shopping_cart',
         on_delete=models.CASCADE
     )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         unique_together = ('user', 'recipe')
+
+
+class ShoppingListItem(models.Model):
+    """Суммарное количество ингредиента по рецептам в корзине пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items'
+    )
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    amount = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Список покупок'
+        unique_together = ('user', 'ingredient')
+
+
+class ShoppingListPDF(models.Model):
+    """Задание на рендеринг списка покупок в PDF и его результат."""
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_pdfs'
+    )
+    # Хэш содержимого списка: неизменная корзина отдаётся готовым файлом
+    cart_hash = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=PENDING
+    )
+    file = models.FileField(upload_to='shopping_lists/', blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'PDF списка покупок'
+        verbose_name_plural = 'PDF списков покупок'
+        indexes = [
+            models.Index(
+                fields=['user', 'cart_hash'], name='shoppinglistpdf_hash_idx'
+            ),
+        ]
+
+
+class Change(models.Model):
+    """Запись журнала изменений для инкрементальной синхронизации клиентов."""
+    RECIPE = 'recipe'
+    USER = 'user'
+    INGREDIENT = 'ingredient'
+    FAVORITE = 'favorite'
+    CART = 'cart'
+    SUBSCRIPTION = 'subscription'
+    KIND_CHOICES = [
+        (RECIPE, 'Рецепт'),
+        (USER, 'Пользователь'),
+        (INGREDIENT, 'Ингредиент'),
+        (FAVORITE, 'Избранное'),
+        (CART, 'Корзина'),
+        (SUBSCRIPTION, 'Подписка'),
+    ]
+
+    # Курсор синхронизации — (txid, id): номер транзакции в PostgreSQL
+    # упорядочивает записи по коммиту, id — внутри транзакции
+    id = models.BigAutoField(primary_key=True)
+    txid = models.BigIntegerField(default=0, editable=False)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    # Рецепт для избранного и корзины, автор для подписки
+    object_id = models.PositiveBigIntegerField()
+    # Владелец личных изменений (избранное, корзина, подписки); у общих —
+    # пусто. Не внешний ключ: надгробия переживают удаление пользователя
+    owner_id = models.PositiveBigIntegerField(null=True, blank=True)
+    # Надгробие: объект или связь удалены
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+        indexes = [
+            models.Index(fields=['txid', 'id'], name='change_cursor_idx'),
+        ]
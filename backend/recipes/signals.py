@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Отправляется после того, как у рецепта переписан состав ингредиентов;
+# previous — прежний состав {ingredient_id: amount}
+ingredients_changed = Signal()
@@ -0,0 +1,67 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tasks.queue import Worker
+
+
+def run_process(threads, poll_interval, once):
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *args: stop_event.set())
+    Worker(threads, poll_interval, stop_event).run(once=once)
+
+
+class Command(BaseCommand):
+    help = 'Запуск воркера очереди отложенных задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=1, help='Число процессов'
+        )
+        parser.add_argument(
+            '--threads', type=int, default=4,
+            help='Потоков в каждом процессе'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Пауза при пустой очереди, с'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти'
+        )
+
+    def handle(self, *args, **options):
+        worker_args = (
+            options['threads'], options['poll_interval'], options['once']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Воркер запущен: процессов {options['processes']}, "
+            f"потоков {options['threads']}"
+        ))
+        if options['processes'] == 1:
+            run_process(*worker_args)
+            return
+
+        # Дочерние процессы не должны унаследовать открытые соединения с БД
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=run_process, args=worker_args)
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+
+        def stop(*args):
+            for process in processes:
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for process in processes:
+            process.join()
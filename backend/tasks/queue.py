@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import (
+    DatabaseError, close_old_connections, connection, transaction
+)
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger('tasks')
+
+TaskSpec = namedtuple('TaskSpec', ['func', 'max_attempts', 'retry_delay'])
+REGISTRY = {}
+
+
+def task(max_attempts=3, retry_delay=10):
+    # Регистрирует функцию как задачу; func.delay(**kwargs) ставит её
+    # в очередь. Аргументы передаются через JSON, поэтому только простые
+    # значения
+    def decorator(func):
+        name = f'{func.__module__}.{func.__name__}'
+        REGISTRY[name] = TaskSpec(func, max_attempts, retry_delay)
+        func.delay = partial(enqueue, name)
+        return func
+    return decorator
+
+
+def enqueue(task_name, /, countdown=0, **kwargs):
+    # Строка задачи пишется в текущей транзакции: воркер увидит её
+    # только вместе с изменениями, которые её породили.
+    # countdown — задержка запуска в секундах
+    spec = REGISTRY[task_name]
+    if settings.TASKS_EAGER:
+        spec.func(**kwargs)
+        return None
+    return Task.objects.create(
+        name=task_name, kwargs=kwargs, max_attempts=spec.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=countdown),
+    )
+
+
+def requeue_stale():
+    # Задачи воркера, который упал посреди выполнения, возвращаются в очередь
+    deadline = timezone.now() - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    return Task.objects.filter(
+        status=Task.RUNNING, locked_at__lt=deadline
+    ).update(status=Task.QUEUED, locked_at=None)
+
+
+def claim(limit):
+    # SKIP LOCKED: параллельные воркеры не ждут друг друга и не берут
+    # одно и то же
+    now = timezone.now()
+    with transaction.atomic():
+        tasks = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status=Task.QUEUED, run_at__lte=now)
+            .order_by('run_at')[:limit]
+        )
+        Task.objects.filter(pk__in=[item.pk for item in tasks]).update(
+            status=Task.RUNNING, locked_at=now, attempts=F('attempts') + 1
+        )
+    for item in tasks:
+        item.attempts += 1
+    return tasks
+
+
+def execute(item):
+    spec = REGISTRY.get(item.name)
+    try:
+        if spec is None:
+            raise LookupError(f'Задача {item.name} не зарегистрирована')
+        spec.func(**item.kwargs)
+    except Exception:
+        logger.exception(
+            'Задача %s #%s завершилась ошибкой', item.name, item.pk
+        )
+        updates = {'locked_at': None, 'last_error': traceback.format_exc()}
+        if spec is None or item.attempts >= item.max_attempts:
+            updates['status'] = Task.FAILED
+        else:
+            # Экспоненциальная пауза между повторами
+            delay = spec.retry_delay * 2 ** (item.attempts - 1)
+            updates['status'] = Task.QUEUED
+            updates['run_at'] = timezone.now() + timedelta(seconds=delay)
+        Task.objects.filter(pk=item.pk).update(**updates)
+    else:
+        Task.objects.filter(pk=item.pk).delete()
+
+
+def run_in_thread(item):
+    try:
+        execute(item)
+    finally:
+        connection.close()
+
+
+class Worker:
+    def __init__(self, threads=4, poll_interval=1.0, stop_event=None):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.stop_event = stop_event or threading.Event()
+
+    def run(self, once=False):
+        # once — разобрать очередь и выйти (отложенные на будущее задачи
+        # не ждём)
+        running = set()
+        last_requeue = float('-inf')
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                since_requeue = time.monotonic() - last_requeue
+                if since_requeue > settings.TASKS_LOCK_TIMEOUT / 2:
+                    requeue_stale()
+                    last_requeue = time.monotonic()
+                free = self.threads - len(running)
+                try:
+                    tasks = claim(free) if free else []
+                except DatabaseError:
+                    # БД недоступна или занята: воркер не падает,
+                    # а пробует снова
+                    logger.exception('Не удалось получить задачи из очереди')
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+                for item in tasks:
+                    running.add(pool.submit(run_in_thread, item))
+                if running and (not tasks or len(running) >= self.threads):
+                    _, running = wait(
+                        running, timeout=self.poll_interval,
+                        return_when=FIRST_COMPLETED
+                    )
+                elif not tasks:
+                    if once:
+                        break
+                    self.stop_event.wait(self.poll_interval)
+            wait(running)
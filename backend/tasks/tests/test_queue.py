@@ -0,0 +1,146 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from tasks import queue
+from tasks.models import Task
+
+calls = []
+
+
+@queue.task(max_attempts=3, retry_delay=10)
+def remember(value):
+    calls.append(value)
+
+
+@queue.task(max_attempts=2, retry_delay=5)
+def explode():
+    raise RuntimeError('boom')
+
+
+@override_settings(TASKS_EAGER=False, TASKS_LOCK_TIMEOUT=600)
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_creates_row_without_running(self):
+        item = remember.delay(value=1, countdown=60)
+        self.assertEqual(calls, [])
+        self.assertEqual(item.kwargs, {'value': 1})
+        self.assertEqual(item.status, Task.QUEUED)
+        self.assertGreater(item.run_at, timezone.now())
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_immediately(self):
+        self.assertIsNone(remember.delay(value=2))
+        self.assertEqual(calls, [2])
+        self.assertFalse(Task.objects.exists())
+
+    def test_claim_takes_due_tasks_in_order(self):
+        later = remember.delay(value=1, countdown=60)
+        second = remember.delay(value=2)
+        first = remember.delay(value=3)
+        Task.objects.filter(pk=first.pk).update(
+            run_at=timezone.now() - timedelta(seconds=5)
+        )
+        claimed = queue.claim(limit=5)
+        self.assertEqual([item.pk for item in claimed], [first.pk, second.pk])
+        self.assertEqual([item.attempts for item in claimed], [1, 1])
+        self.assertEqual(
+            set(Task.objects.filter(status=Task.RUNNING).values_list(
+                'pk', flat=True
+            )),
+            {first.pk, second.pk}
+        )
+        self.assertEqual(Task.objects.get(pk=later.pk).status, Task.QUEUED)
+        self.assertEqual(queue.claim(limit=5), [])
+
+    def test_claim_respects_limit(self):
+        for value in range(3):
+            remember.delay(value=value)
+        self.assertEqual(len(queue.claim(limit=2)), 2)
+        self.assertEqual(len(queue.claim(limit=2)), 1)
+
+    def test_success_deletes_task(self):
+        remember.delay(value=4)
+        [item] = queue.claim(limit=1)
+        queue.execute(item)
+        self.assertEqual(calls, [4])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failure_retries_with_backoff_then_fails(self):
+        explode.delay()
+        with self.assertLogs('tasks', 'ERROR'):
+            [item] = queue.claim(limit=1)
+            before = timezone.now()
+            queue.execute(item)
+        task = Task.objects.get(pk=item.pk)
+        self.assertEqual(task.status, Task.QUEUED)
+        self.assertEqual(task.attempts, 1)
+        self.assertIsNone(task.locked_at)
+        self.assertIn('RuntimeError: boom', task.last_error)
+        self.assertGreaterEqual(task.run_at, before + timedelta(seconds=5))
+        self.assertEqual(queue.claim(limit=1), [])
+
+        Task.objects.filter(pk=item.pk).update(run_at=timezone.now())
+        with self.assertLogs('tasks', 'ERROR'):
+            [item] = queue.claim(limit=1)
+            queue.execute(item)
+        task = Task.objects.get(pk=item.pk)
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(task.attempts, 2)
+
+    def test_second_retry_waits_twice_as_long(self):
+        explode.delay()
+        Task.objects.update(attempts=1, max_attempts=3)
+        [item] = queue.claim(limit=1)
+        moment = timezone.now()
+        with mock.patch.object(queue.timezone, 'now', return_value=moment):
+            with self.assertLogs('tasks', 'ERROR'):
+                queue.execute(item)
+        self.assertEqual(
+            Task.objects.get(pk=item.pk).run_at,
+            moment + timedelta(seconds=10)
+        )
+
+    def test_unknown_task_fails_at_once(self):
+        Task.objects.create(name='tasks.missing', max_attempts=5)
+        with self.assertLogs('tasks', 'ERROR'):
+            [item] = queue.claim(limit=1)
+            queue.execute(item)
+        self.assertEqual(Task.objects.get(pk=item.pk).status, Task.FAILED)
+
+    def test_requeue_stale_returns_abandoned_tasks(self):
+        stale = remember.delay(value=1)
+        fresh = remember.delay(value=2)
+        queue.claim(limit=2)
+        Task.objects.filter(pk=stale.pk).update(
+            locked_at=timezone.now() - timedelta(seconds=601)
+        )
+        self.assertEqual(queue.requeue_stale(), 1)
+        self.assertEqual(Task.objects.get(pk=stale.pk).status, Task.QUEUED)
+        self.assertEqual(Task.objects.get(pk=fresh.pk).status, Task.RUNNING)
+        [item] = queue.claim(limit=2)
+        self.assertEqual(item.pk, stale.pk)
+        self.assertEqual(item.attempts, 2)
+
+
+# Воркер читает очередь из своих потоков: данные должны быть закоммичены
+@override_settings(TASKS_EAGER=False, TASKS_LOCK_TIMEOUT=600)
+class WorkerTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_worker_drains_queue(self):
+        for value in range(3):
+            remember.delay(value=value)
+        with self.assertLogs('tasks', 'ERROR'):
+            explode.delay()
+            queue.Worker(threads=2, poll_interval=0.01).run(once=True)
+        self.assertEqual(sorted(calls), [0, 1, 2])
+        self.assertEqual(
+            list(Task.objects.values_list('name', 'status')),
+            [('tasks.tests.test_queue.explode', Task.QUEUED)]
+        )
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:54
+
+import foodgram.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_user_subscribers_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, storage=foodgram.storage.image_storage, upload_to='avatars/', verbose_name='Аватар'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from foodgram.storage import image_storage
+
 
 class User(AbstractUser):
     """
@@ -18,10 +20,20 @@ class User(AbstractUser):
     )
     avatar = models.ImageField(
         upload_to='avatars/',
+        storage=image_storage,
         null=True,
         blank=True,
         verbose_name='Аватар'
     )
+    # Денормализованный счётчик: по нему лента решает, рассылать ли рецепты
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Изменён'
+    )
 
     # Используем email как поле для входа вместо username
     USERNAME_FIELD = 'email'